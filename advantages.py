@@ -0,0 +1,77 @@
+# Generalized advantage estimation (GAE) of the PPO trainers over a whole rollout buffer.
+#
+# compute_gae takes the rollout buffers of continuous_ppo.py / load_RL_model.py ((num_steps, num_envs)
+# tensors, dones[t] = the episode ended before step t) and returns (advantages, returns), the same
+# as the reversed loop over the steps:
+#   A[t] = delta[t] + gamma*gae_lambda*(1-end[t])*A[t+1]
+# The steps are cut in blocks of block_size. Inside a block the sums are computed for all steps at
+# once (scaled reverse cumulative sum, cut at the episode ends), and the blocks are chained back with
+# one multiply-add each: a 1012-step buffer is 4 blocks instead of 1012 iterations of 6 tensor ops.
+# The sums of a block are scaled by discount**i, so a block is cut to the steps where discount**i
+# stays over MIN_SCALE (far from the float32 denormals): 65 steps for gamma=0.99 and gae_lambda=0.5,
+# block_size from gae_lambda=0.95 on.
+# Works on any device; the result is the loop's up to float rounding.
+#
+# A truncated episode (time limit, not a failure/delivery) does not end with a value of 0: pass
+# truncations[t] (step t was truncated and not terminated) and final_values[t] (value of its
+# infos["final_observation"]) and its last step is bootstrapped from that value.
+#
+# Benchmark against the loop: python benchmarks/bench_gae.py
+
+import math
+
+import torch
+
+MIN_SCALE = 1e-20                                        # smallest discount**i inside a block
+
+
+def compute_gae(rewards, values, dones, next_value, next_done, gamma=0.99, gae_lambda=0.95,
+                truncations=None, final_values=None, block_size=256):
+    # end of the episode after step t, and the value after step t
+    ends = torch.cat((dones[1:], next_done.reshape(1, -1)))
+    next_values = torch.cat((values[1:], next_value.reshape(1, -1)))
+
+    bootstrap = next_values * (1.0 - ends)
+    if truncations is not None:
+        bootstrap = bootstrap + truncations * final_values
+    deltas = rewards + gamma * bootstrap - values
+
+    advantages = discounted_sum(deltas, ends, gamma * gae_lambda, block_size)
+    return advantages, advantages + values
+
+
+def discounted_sum(x, ends, discount, block_size=256):
+    # out[t] = x[t] + discount*(1-ends[t])*out[t+1] over the first dimension
+    if discount == 0:
+        return x.clone()
+    num_steps, num_envs = x.shape
+    block = min(block_size, num_steps)
+    if discount < 1:
+        block = min(block, max(1, int(math.log(MIN_SCALE) / math.log(discount))))
+    blocks = -(-num_steps // block)
+    pad = blocks * block - num_steps
+    if pad:
+        x = torch.cat((x, x.new_zeros(pad, num_envs)))
+        ends = torch.cat((ends, ends.new_ones(pad, num_envs)))
+    x = x.reshape(blocks, block, num_envs)
+    ends = ends.reshape(blocks, block, num_envs)
+
+    # inside a block: out[i] = discount**-i * sum of discount**j * x[j] over i <= j <= end of the
+    # episode, a reverse cumulative sum minus the one after the end of the episode
+    index = torch.arange(block, device=x.device)
+    scale = (discount ** index.to(x.dtype))[None, :, None]
+    tail = torch.cat((torch.flip(torch.cumsum(torch.flip(x * scale, (1,)), 1), (1,)), x.new_zeros(blocks, 1, num_envs)), 1)
+    end_index = torch.where(ends > 0, index[None, :, None], block)
+    episode_end = torch.flip(torch.cummin(torch.flip(end_index, (1,)), 1).values, (1,))
+    after_end = torch.clamp(episode_end + 1, max=block)
+    local = (tail[:, :-1] - torch.gather(tail, 1, after_end)) / scale
+
+    # the first step of the next block goes on with discount**(block-i) when the episode does not end before
+    carry = (discount ** (block - index).to(x.dtype))[None, :, None] * (episode_end == block)
+
+    out = torch.empty_like(local)
+    following = x.new_zeros(num_envs)
+    for b in reversed(range(blocks)):
+        out[b] = local[b] + carry[b] * following
+        following = out[b, 0]
+    return out.reshape(blocks * block, num_envs)[:num_steps]
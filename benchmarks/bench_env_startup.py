@@ -0,0 +1,87 @@
+# Per-worker startup time and resident memory of the DeliveryEnv pool.
+#
+# usage: python benchmarks/bench_env_startup.py [num_envs ...]
+#
+# "headless" is the current env (pygame is never imported), "pygame" imports pygame and builds a
+# clock in every worker the way env.py used to, so both numbers can be compared on the same machine.
+
+import os, sys, time, subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import gymnasium as gym
+
+
+WORKER_CODE = """
+import time, resource, sys
+t = time.perf_counter()
+if {with_pygame}:
+    import pygame
+    pygame.time.Clock()
+from env import DeliveryEnv
+env = DeliveryEnv()
+env.reset()
+t = time.perf_counter() - t
+print(t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, 'pygame' in sys.modules)
+"""
+
+
+def single_worker(with_pygame, repeat=5):
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    times, rss = [], []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", WORKER_CODE.format(with_pygame=with_pygame)],
+                             cwd=root, capture_output=True, text=True, check=True).stdout.split()
+        times.append(float(out[-3]))
+        rss.append(int(out[-2]))
+    return min(times), min(rss), out[-1]
+
+
+def rss_kb(pid):
+    # resident memory of a process from /proc (linux only)
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def make_env(with_pygame):
+    def thunk():
+        if with_pygame:
+            import pygame
+            pygame.time.Clock()
+        from env import DeliveryEnv
+        return DeliveryEnv()
+    return thunk
+
+
+def pool(num_envs, with_pygame):
+    t = time.perf_counter()
+    envs = gym.vector.AsyncVectorEnv([make_env(with_pygame) for _ in range(num_envs)])
+    envs.reset()
+    t = time.perf_counter() - t
+    total_rss = sum(rss_kb(p.pid) for p in envs.processes)
+    envs.close()
+    return t, total_rss
+
+
+if __name__ == "__main__":
+
+    sizes = [int(n) for n in sys.argv[1:]] or [24, 64]
+
+    print("single worker (import + construct + reset)")
+    for with_pygame in (False, True):
+        t, rss, imported = single_worker(with_pygame)
+        name = "pygame  " if with_pygame else "headless"
+        print(f"  {name}: {t*1000:8.1f} ms  maxrss {rss/1024:7.1f} MB  pygame imported: {imported}")
+
+    print("AsyncVectorEnv pool (spawn + reset)")
+    for num_envs in sizes:
+        for with_pygame in (False, True):
+            t, rss = pool(num_envs, with_pygame)
+            name = "pygame  " if with_pygame else "headless"
+            print(f"  {num_envs:3d} envs {name}: {t:6.2f} s  workers rss {rss/1024:8.1f} MB ({rss/1024/num_envs:.1f} MB/worker)")
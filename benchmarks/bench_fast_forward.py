@@ -0,0 +1,52 @@
+# Speedup and trajectory error of the sleep-aware fast-forward of DeliveryEnv against plain stepping.
+#
+# usage: python benchmarks/bench_fast_forward.py
+#
+# Every profile is run until the episode terminates (or max_steps) with fast_forward off and on.
+# The error is the largest difference of the raw observation between both runs, the episode
+# length and reward have to be the same.
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from env import DeliveryEnv
+
+
+def profiles(max_steps):
+    # slow constant speeds (the object catches up with the tray) and piecewise-constant speeds
+    rng = np.random.default_rng(0)
+    result = {f"constant {value}": np.full(max_steps, value) for value in (0.5, 1.0, 2.0)}
+    for i in range(3):
+        levels = rng.uniform(0.5, 2.0, size=max_steps // 500 + 1)
+        result[f"piecewise {i}"] = np.repeat(levels, 500)[:max_steps]
+    return result
+
+
+def run(actions, fast_forward, **env_kwargs):
+    env = DeliveryEnv(fast_forward=fast_forward, **env_kwargs)
+    env.reset()
+    trajectory = []
+    start = time.perf_counter()
+    for action in actions:
+        obs, reward, terminal, _, _ = env.step(action)
+        trajectory.append(obs)
+        if terminal:
+            break
+    elapsed = time.perf_counter() - start
+    return np.array(trajectory), reward, elapsed
+
+
+if __name__ == "__main__":
+
+    max_steps = 10000
+    print(f"{'profile':>12} {'steps':>6} {'plain (s)':>10} {'ff (s)':>8} {'speedup':>8} {'max |error|':>12} {'|d diff|':>9}  same end")
+    for name, actions in profiles(max_steps).items():
+        plain, plain_reward, plain_time = run(actions, False)
+        ff, ff_reward, ff_time = run(actions, True)
+        steps = min(len(plain), len(ff))
+        error = np.abs(plain[:steps] - ff[:steps]).max(axis=0)
+        same_end = len(plain) == len(ff) and plain_reward == ff_reward
+        print(f"{name:>12} {len(plain):6d} {plain_time:10.3f} {ff_time:8.3f} {plain_time/ff_time:7.1f}x {error.max():12.4f} {error[4]:9.4f}  {same_end}")
@@ -0,0 +1,95 @@
+# Advantage estimation of the PPO trainer: the reversed Python loop against advantages.compute_gae.
+#
+# usage: python benchmarks/bench_gae.py [iterations]
+#
+# "loop" is the code of continuous_ppo.py before compute_gae. Both are run on the same random
+# rollout buffers (rewards in {-1, 0, 1}, ~1% of the steps ending an episode) at the trainer size
+# (1012 steps x 24 envs) and larger ones, and have to agree up to float rounding. The time is per
+# rollout buffer, on the CPU (and on CUDA when available). Low gae_lambda values (short blocks, see
+# advantages.py) are checked too.
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import torch
+
+from advantages import compute_gae
+
+
+def loop_gae(rewards, values, dones, next_value, next_done, gamma=0.99, gae_lambda=0.95):
+    # same as continuous_ppo.py / load_RL_model.py
+    num_steps = rewards.shape[0]
+    advantages = torch.zeros_like(rewards)
+    lastgaelam = 0
+    for t in reversed(range(num_steps)):
+        if t == num_steps - 1:
+            nextnonterminal = 1.0 - next_done
+            nextvalues = next_value
+        else:
+            nextnonterminal = 1.0 - dones[t+1]
+            nextvalues = values[t+1]
+
+        delta = rewards[t] + gamma*nextvalues * nextnonterminal - values[t]
+        advantages[t] = lastgaelam = delta + gamma * gae_lambda * nextnonterminal * lastgaelam
+    return advantages, advantages + values
+
+
+def rollout(num_steps, num_envs, device, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    rewards = torch.randint(-1, 2, (num_steps, num_envs), generator=generator).float()
+    values = torch.randn(num_steps, num_envs, generator=generator)
+    dones = (torch.rand(num_steps, num_envs, generator=generator) < 0.01).float()
+    next_value = torch.randn(1, num_envs, generator=generator)
+    next_done = (torch.rand(num_envs, generator=generator) < 0.01).float()
+    return [tensor.to(device) for tensor in (rewards, values, dones, next_value, next_done)]
+
+
+def timed(function, iterations, device):
+    function()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    if device.type == "cuda":
+        torch.cuda.synchronize()
+    return (time.perf_counter() - start) / iterations * 1e3
+
+
+if __name__ == "__main__":
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    devices = [torch.device("cpu")] + ([torch.device("cuda")] if torch.cuda.is_available() else [])
+
+    # truncation: the value of the final observation is added to the bootstrap of the truncated step
+    rewards, values, dones, next_value, next_done = rollout(50, 3, "cpu")
+    truncations = torch.zeros_like(rewards)
+    truncations[20, 1] = 1.0
+    dones[21, 1] = 1.0
+    final_values = torch.full_like(rewards, 2.0)
+    plain, _ = compute_gae(rewards, values, dones, next_value, next_done)
+    truncated, _ = compute_gae(rewards, values, dones, next_value, next_done, truncations=truncations, final_values=final_values)
+    assert torch.allclose(truncated[20, 1] - plain[20, 1], torch.tensor(0.99 * 2.0))
+    assert torch.equal(truncated[21:], plain[21:]) and torch.equal(truncated[:, 0], plain[:, 0])
+
+    # low gae_lambda: discount**i of a long block would go under the float32 range
+    for gae_lambda in (0.0, 0.3, 0.5, 0.7, 0.9):
+        buffers = rollout(1012, 8, "cpu")
+        reference, _ = loop_gae(*buffers, gae_lambda=gae_lambda)
+        advantages, _ = compute_gae(*buffers, gae_lambda=gae_lambda)
+        assert torch.allclose(advantages, reference, rtol=1e-5, atol=1e-5), gae_lambda
+
+    print(f"{'device':>6} {'steps x envs':>14} {'loop (ms)':>10} {'compute_gae (ms)':>17} {'speed-up':>9} {'max diff':>9}")
+    for device in devices:
+        for num_steps, num_envs in ((1012, 24), (1012, 256), (4096, 64)):
+            buffers = rollout(num_steps, num_envs, device)
+            reference, reference_returns = loop_gae(*buffers)
+            advantages, returns = compute_gae(*buffers)
+            difference = (advantages - reference).abs().max().item()
+            assert torch.allclose(advantages, reference, rtol=1e-4, atol=1e-4)
+            assert torch.allclose(returns, reference_returns, rtol=1e-4, atol=1e-4)
+
+            loop = timed(lambda: loop_gae(*buffers), iterations, device)
+            vectorised = timed(lambda: compute_gae(*buffers), iterations, device)
+            print(f"{device.type:>6} {f'{num_steps} x {num_envs}':>14} {loop:10.2f} {vectorised:17.2f} {loop/vectorised:8.1f}x {difference:9.2e}")
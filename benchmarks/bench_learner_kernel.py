@@ -0,0 +1,133 @@
+# Ticks/s of the compiled learner kernel (learner_kernel.py) against Learner.tick (learner.py).
+#
+# usage: python benchmarks/bench_learner_kernel.py [rule] [learners]
+#
+# The positions of a headless closed-loop run (learner_sim.run, 3 kg, friction 1.0) are recorded
+# and replayed through a new Learner and through the kernel; the speeds, resets, log rows and the
+# final state have to be identical. Then:
+#   "Learner.tick"     : the reference, one Python call per tick
+#   "kernel tick"      : learner_kernel.tick called from Python once per tick
+#   "kernel run_ticks" : the whole replay in one call
+#   "tick_population"  : one tick of many learners (random positions) in one call
+# Without Numba the kernel runs as plain Python (about as fast as Learner).
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from learner import Learner
+import learner_kernel
+import learner_sim
+
+
+class RecordingLearner(Learner):
+    # Learner that keeps the inputs of every tick
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.inputs = []
+
+    def tick(self, xc, xr, t):
+        self.inputs.append((xc, xr, t))
+        return super().tick(xc, xr, t)
+
+
+def reference(rule, xc, xr, t):
+    learner = Learner(rule)
+    speeds, resets, rows = [], [], []
+    for i in range(len(xc)):
+        speed, reset = learner.tick(xc[i], xr[i], t[i])
+        speeds.append(np.nan if speed is None else speed)
+        resets.append(reset)
+        rows.append([np.nan] * learner_kernel.ROW_SIZE if learner.row is None else learner.row)
+    return learner, np.array(speeds), np.array(resets), np.array(rows, dtype=np.float64)
+
+
+def kernel(rule, xc, xr, t):
+    learner = Learner(rule)
+    params, state = learner_kernel.params_of(learner), learner_kernel.state_of(learner)
+    speeds, resets = np.empty(len(xc)), np.empty(len(xc), dtype=np.bool_)
+    rows = np.empty((len(xc), learner_kernel.ROW_SIZE))
+    n = learner_kernel.run_ticks(params, state, xc, xr, t, speeds, resets, rows)
+    learner_kernel.store_state(learner, state)
+    return learner, speeds[:n], resets[:n], rows[:n]
+
+
+def reference_ticks(rule, xc, xr, t):
+    learner = Learner(rule)
+    tick = learner.tick
+    for i in range(len(xc)):
+        tick(xc[i], xr[i], t[i])
+
+
+def kernel_per_tick(rule, xc, xr, t):
+    learner = Learner(rule)
+    params, state = learner_kernel.params_of(learner), learner_kernel.state_of(learner)
+    row = np.empty(learner_kernel.ROW_SIZE)
+    tick = learner_kernel.tick
+    for i in range(len(xc)):
+        tick(params, state, xc[i], xr[i], t[i], row)
+
+
+def timed(function, ticks, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return ticks / best
+
+
+if __name__ == "__main__":
+
+    rule = sys.argv[1] if len(sys.argv) > 1 else "mICO"
+    num = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    # closed-loop positions of a full run
+    recorder = RecordingLearner(rule)
+    learner_sim.run(recorder, None, obj_mass=3.0, obj_friction=1.0)
+    xc, xr, t = (np.array(column, dtype=np.float64) for column in zip(*recorder.inputs))
+    ticks = len(xc)
+
+    # bit for bit the same as Learner
+    ref, ref_speeds, ref_resets, ref_rows = reference(rule, xc, xr, t)
+    ker, ker_speeds, ker_resets, ker_rows = kernel(rule, xc, xr, t)
+    assert np.array_equal(ref_speeds, ker_speeds, equal_nan=True)
+    assert np.array_equal(ref_resets, ker_resets)
+    assert np.array_equal(ref_rows, ker_rows, equal_nan=True)
+    assert (ref.wa, ref.t_prev, ref.prev, ref.attempt, ref.redo, ref.failed) == \
+           (ker.wa, ker.t_prev, ker.prev, ker.attempt, ker.redo, ker.failed)
+
+    # all the rounding branches of the signals
+    values = np.concatenate([np.random.default_rng(0).uniform(0, 80, 200000), np.arange(0, 80, 0.005)])
+    params = learner_kernel.params_of(Learner(rule))
+    check = Learner(rule)
+    for diff_x in values:
+        assert learner_kernel.signal_generator(params, float(diff_x), 0.0) == check.signal_generator(float(diff_x), 0.0)
+
+    reference_rate = timed(lambda: reference_ticks(rule, xc, xr, t), ticks)
+    per_tick_rate = timed(lambda: kernel_per_tick(rule, xc, xr, t), ticks)
+    run_rate = timed(lambda: kernel(rule, xc, xr, t), ticks)
+
+    population = [Learner(rule, l_rate=l_rate) for l_rate in np.geomspace(1e-4, 0.05, num)]
+    params = np.array([learner_kernel.params_of(learner) for learner in population])
+    rng = np.random.default_rng(0)
+    steps = 100
+    xc_pop, xr_pop = rng.uniform(100, 180, (steps, num)), np.full((steps, num), 100.0)
+    speeds, resets = np.empty(num), np.empty(num, dtype=np.bool_)
+    rows = np.empty((num, learner_kernel.ROW_SIZE))
+
+    def population_ticks():
+        state = np.array([learner_kernel.state_of(learner) for learner in population])
+        for step in range(steps):
+            learner_kernel.tick_population(params, state, xc_pop[step], xr_pop[step], step / 60, speeds, resets, rows)
+
+    population_rate = timed(population_ticks, steps * num)
+
+    print(f"{rule}, {ticks} ticks replayed bit for bit, numba: {learner_kernel.HAVE_NUMBA}")
+    print(f"{'Learner.tick':>18} {reference_rate:12.0f} ticks/s")
+    print(f"{'kernel tick':>18} {per_tick_rate:12.0f} ticks/s  ({per_tick_rate/reference_rate:.1f}x)")
+    print(f"{'kernel run_ticks':>18} {run_rate:12.0f} ticks/s  ({run_rate/reference_rate:.1f}x)")
+    print(f"{'tick_population':>18} {population_rate:12.0f} ticks/s  ({population_rate/reference_rate:.1f}x, {num} learners)")
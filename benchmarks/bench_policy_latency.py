@@ -0,0 +1,93 @@
+# Latency of the policy for one observation (the control loop of the templates steps one tray).
+#
+# usage: python benchmarks/bench_policy_latency.py [checkpoint] [iterations]
+#
+# Without a checkpoint, an untrained agent with random normaliser statistics is used. Each path
+# takes the raw observation of DeliveryEnv.get_observation and gives the tray velocity:
+#   get_action_and_value : the training path (normalisation, Normal distribution, log-prob, entropy, critic)
+#   actor_mean           : normalisation + actor_mean under torch.inference_mode()
+#   torchscript          : export_policy .pt (normalisation and rescale folded in)
+#   numpy                : export_policy .npz with NumpyPolicy.act
+# The exported ones have to agree with actor_mean up to float rounding.
+
+import os, sys, tempfile, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import torch
+
+from continuous_ppo import Agent
+from evaluate_policy import load_agent
+from export_policy import ACTION_SCALE, NumpyPolicy, export_policy
+from vector_env import DeliveryVectorEnv
+
+
+def timed(function, observations, iterations):
+    for obs in observations[:100]:
+        function(obs)
+    start = time.perf_counter()
+    for i in range(iterations):
+        function(observations[i % len(observations)])
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    torch.set_num_threads(1)
+
+    envs = DeliveryVectorEnv(1)
+    agent = Agent(envs)
+    rng = np.random.default_rng(0)
+    if path is None:
+        mean, var = rng.uniform(0, 300, 5), rng.uniform(1, 1e4, 5)
+    else:
+        state_dict, (mean, var) = load_agent(path)
+        agent.load_state_dict(state_dict)
+    agent.eval()
+    envs.close()
+
+    # raw observations along a delivery: tray ahead of the object by up to 30 px
+    rect_x = rng.uniform(100, 699, 1000)
+    square_x = rect_x - rng.uniform(0, 30, 1000)
+    observations = np.stack([rect_x, rng.uniform(0, 100, 1000), square_x, rng.uniform(0, 100, 1000), rect_x - square_x], 1)
+    std = np.sqrt(var + 1e-8)
+
+    def normalized(obs):
+        # same as DeliveryVectorEnv.normalize
+        return torch.from_numpy(((obs - mean) / std).astype(np.float32)).reshape(1, -1)
+
+    def training_path(obs):
+        with torch.no_grad():
+            action, _, _, _ = agent.get_action_and_value(normalized(obs))
+        return ACTION_SCALE * float(action[0, 0])
+
+    def actor_mean(obs):
+        with torch.inference_mode():
+            return ACTION_SCALE * float(agent.actor_mean(normalized(obs))[0, 0])
+
+    directory = tempfile.mkdtemp()
+    state_dict = agent.state_dict()
+    export_policy(state_dict, (mean, var), os.path.join(directory, "policy.pt"))
+    export_policy(state_dict, (mean, var), os.path.join(directory, "policy.npz"))
+    scripted = torch.jit.load(os.path.join(directory, "policy.pt"))
+    numpy_policy = NumpyPolicy.load(os.path.join(directory, "policy.npz"))
+
+    def torchscript(obs):
+        with torch.inference_mode():
+            return float(scripted(torch.from_numpy(obs).float())[0])
+
+    # the exported policies give the velocity of the agent's mean action
+    reference = np.array([actor_mean(obs) for obs in observations])
+    for name, policy in (("torchscript", torchscript), ("numpy", numpy_policy)):
+        got = np.array([policy(obs) for obs in observations])
+        assert np.allclose(got, reference, rtol=1e-4, atol=1e-4 * np.abs(reference).max()), name
+    assert np.allclose(numpy_policy(observations), reference, rtol=1e-4, atol=1e-4 * np.abs(reference).max())
+
+    print(f"{'path':>21} {'us/obs':>8} {'max rate (kHz)':>15}")
+    for name, policy in (("get_action_and_value", training_path), ("actor_mean", actor_mean),
+                         ("torchscript", torchscript), ("numpy", numpy_policy.act)):
+        latency = timed(policy, observations, iterations)
+        print(f"{name:>21} {latency:8.1f} {1e3/latency:15.1f}")
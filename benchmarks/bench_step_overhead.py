@@ -0,0 +1,89 @@
+# Per-step Python overhead of reading the Box2D bodies in DeliveryEnv (observation, reward, termination).
+#
+# usage: python benchmarks/bench_step_overhead.py [iterations]
+#
+# "direct" is the readout of the original env: get_observation, get_reward and terminate_cond each
+# read rect_body/square_body (12 SWIG calls per step, each creating a temporary b2Vec2).
+# "cached" is the current env: read_body_state reads the 4 values once per step and the three
+# methods reuse them. The physics step is left out (the cache is invalidated as after a step),
+# the full step time is printed for comparison.
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from env import DeliveryEnv
+
+
+def direct_readout(env):
+    # same code as the original get_observation / get_reward / terminate_cond
+    diff = env.rect_body.position.x - env.square_body.position.x
+    obs = np.array((env.rect_body.position.x,
+                    env.rect_body.linearVelocity.x,
+                    env.square_body.position.x,
+                    env.square_body.linearVelocity.x,
+                    diff))
+
+    diff_x = (env.rect_body.position.x-env.square_body.position.x)
+    reward = 0
+    if diff_x > 30:
+        reward += -1
+    if env.rect_body.position.x >=699:
+        reward += 1
+
+    diff_x = (env.rect_body.position.x-env.square_body.position.x)
+    if diff_x > 30 or env.rect_body.position.x >=699:
+        terminated = 1
+    else:
+        terminated = 0
+
+    return obs, reward, terminated
+
+
+def cached_readout(env):
+    # the bodies have moved since the last read
+    env.body_state_valid = False
+    return env.get_observation(), env.get_reward(), env.terminate_cond()
+
+
+def step_into_readout(env, obs_out):
+    # the same part of step_into
+    env.body_state_valid = False
+    state = env.read_body_state()
+    diff_x = state[0] - state[2]
+    obs_out[0, :4] = state
+    obs_out[0, 4] = diff_x
+    return int(state[0] >= 699) - int(diff_x > 30), int(diff_x > 30 or state[0] >= 699)
+
+
+def timed(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+if __name__ == "__main__":
+
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    env = DeliveryEnv()
+    env.reset()
+    env.step(np.array([5.0]))
+    obs_out = np.zeros((1, 5), dtype=np.float32)
+
+    # the readouts have to agree
+    assert np.array_equal(direct_readout(env)[0], cached_readout(env)[0])
+    assert direct_readout(env)[1:] == cached_readout(env)[1:] == step_into_readout(env, obs_out)
+
+    direct = timed(lambda: direct_readout(env), iterations)
+    cached = timed(lambda: cached_readout(env), iterations)
+    into = timed(lambda: step_into_readout(env, obs_out), iterations)
+    step = timed(lambda: env.step(np.array([0.0])), iterations // 10)
+
+    print(f"readout per step, {iterations} iterations")
+    print(f"{'direct b2Body reads':>24} {direct:8.2f} us")
+    print(f"{'cached body state':>24} {cached:8.2f} us  ({direct/cached:.1f}x)")
+    print(f"{'step_into readout':>24} {into:8.2f} us  ({direct/into:.1f}x)")
+    print(f"{'full step (physics)':>24} {step:8.2f} us")
@@ -0,0 +1,59 @@
+# Steps/sec of the batched DeliveryVectorEnv (and the reduced-physics backend) against the
+# AsyncVectorEnv pool of continuous_ppo.py.
+#
+# usage: python benchmarks/bench_vector_env.py [num_envs] [num_steps]
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import gymnasium as gym
+
+from env import DeliveryEnv
+from vector_env import DeliveryVectorEnv
+from reduced_env import ReducedDeliveryVectorEnv
+from shm_vector_env import SharedMemoryDeliveryVectorEnv
+
+
+def make_env():
+    # same wrappers as continuous_ppo.py
+    def thunk():
+        env = DeliveryEnv()
+        env = gym.wrappers.NormalizeObservation(env)
+        env = gym.wrappers.RecordEpisodeStatistics(env)
+        return env
+    return thunk
+
+
+def run(envs, num_envs, num_steps, seed=0):
+    rng = np.random.default_rng(seed)
+    actions = rng.uniform(0, 40, size=(num_steps, num_envs, 1)).astype(np.float32)
+
+    envs.reset()
+    start = time.perf_counter()
+    for step in range(num_steps):
+        envs.step(actions[step])
+    elapsed = time.perf_counter() - start
+    envs.close()
+
+    return num_steps * num_envs / elapsed
+
+
+if __name__ == "__main__":
+
+    num_envs = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    num_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+    backends = {
+        "AsyncVectorEnv   ": lambda: gym.vector.AsyncVectorEnv([make_env() for _ in range(num_envs)]),
+        "SyncVectorEnv    ": lambda: gym.vector.SyncVectorEnv([make_env() for _ in range(num_envs)]),
+        "DeliveryVectorEnv": lambda: DeliveryVectorEnv(num_envs, normalize_obs=True),
+        "SharedMemory     ": lambda: SharedMemoryDeliveryVectorEnv(num_envs, normalize_obs=True),
+        "Reduced (NumPy)  ": lambda: ReducedDeliveryVectorEnv(num_envs, normalize_obs=True),
+    }
+
+    print(f"{num_envs} envs, {num_steps} steps, {os.cpu_count()} cpus")
+    for name, make in backends.items():
+        sps = run(make(), num_envs, num_steps)
+        print(f"  {name}: {sps:10.0f} env-steps/s")
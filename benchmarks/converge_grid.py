@@ -0,0 +1,49 @@
+# Check of the ConvergenceMonitor in the batch runs (eval_grid.py, headless_runner.py).
+#
+# usage: python benchmarks/converge_grid.py [template] [obj_mass] [obj_friction] [trials]
+#
+# A stalled condition (by default mISO_template_with_noise at 30g / 0.5 friction, whose weight keeps
+# growing until it fails after ~40000 ticks in trial 2) runs as an eval grid with and without
+# monitor (default settings). The last trial has to stop early with the monitor, with the reason
+# code stationary or attempt_budget in the Outcome and Reason columns of summary.csv, in fewer ticks
+# than without monitor; the other trials have to end the same or earlier.
+# The grids are written to data/converge_check*/ and removed afterwards.
+
+import csv, os, shutil, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import eval_grid
+import learner_sim
+from convergence import STATIONARY, ATTEMPT_BUDGET
+
+
+def summary(output):
+    with open(learner_sim.filepath(os.path.join(output, "summary.csv")), newline='') as f:
+        return list(csv.DictReader(f))
+
+
+if __name__ == "__main__":
+
+    template = sys.argv[1] if len(sys.argv) > 1 else "mISO_template_with_noise"
+    obj_mass = float(sys.argv[2]) if len(sys.argv) > 2 else 0.03
+    obj_friction = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    trials = int(sys.argv[4]) if len(sys.argv) > 4 else 2
+    conditions = [(obj_mass, obj_friction)]
+
+    try:
+        plain = eval_grid.run_grid(template, trials, conditions, output="converge_check")
+        stopped = eval_grid.run_grid(template, trials, conditions, output="converge_check_monitor", monitor={})
+        plain_rows = summary("converge_check")
+        stopped_rows = summary("converge_check_monitor")
+    finally:
+        for output in ("converge_check", "converge_check_monitor"):
+            shutil.rmtree(learner_sim.filepath(output), ignore_errors=True)
+
+    for a, b, row in zip(plain, stopped, stopped_rows):
+        print(f"trial {a['trial']}: {a['outcome']:>14} after {a['ticks']:>6} ticks, with monitor {b['outcome']:>14} after {b['ticks']:>6} ticks")
+        assert b["ticks"] <= a["ticks"]
+        assert row["Outcome"] == b["outcome"] and row["Reason"] == b["reason"]
+        assert b["reason"] in ("", b["outcome"])
+    assert all(r["reason"] == "" and row["Reason"] == "" for r, row in zip(plain, plain_rows))
+    assert stopped[-1]["outcome"] in (STATIONARY, ATTEMPT_BUDGET) and stopped[-1]["ticks"] < plain[-1]["ticks"]
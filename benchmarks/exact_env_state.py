@@ -0,0 +1,125 @@
+# Exactness check of DeliveryEnv.get_state / set_state / reset.
+#
+# usage: python benchmarks/exact_env_state.py [trials] [steps]
+#
+# Each trial plays a random episode part (random speeds, stops long enough for the bodies to fall
+# asleep, some episodes ending in a drop) on an env with random object mass/friction/size, then
+#   reset     : reset() and a new env with the same settings get the same actions
+#   restore   : the state of the canonicalised env is restored into another env with its own random
+#               history
+#   branch    : the same env is restored twice from one state
+#   read-only : get_state() in the middle of a run does not change the run
+# and the trajectories (x and vx of both bodies after every step) have to be equal to the bit.
+# get_state/set_state are also timed against building a new env.
+
+import os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from env import DeliveryEnv
+
+
+def random_actions(rng, steps):
+    # piecewise-constant speeds, with stops (action 0) of up to 100 steps
+    actions = []
+    while len(actions) < steps:
+        value = 0.0 if rng.random() < 0.2 else rng.uniform(-30, 80)
+        actions += [value] * int(rng.integers(1, 100))
+    return np.array(actions[:steps])
+
+
+def play(env, actions):
+    # body state after every step, the env is reset at the end of an episode
+    trajectory = np.empty((len(actions), 4))
+    for i, action in enumerate(actions):
+        env.simulate(action)
+        trajectory[i] = env.read_body_state()
+        if env.terminate_cond():
+            env.reset()
+    return trajectory
+
+
+def make_env(rng):
+    params = {"obj_mass": rng.choice([0.03, 0.3, 3.0]), "obj_friction": rng.choice([0.5, 1.0])}
+    size = rng.uniform(0.15, 0.3)
+    return params, size
+
+
+if __name__ == "__main__":
+
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+
+    failures = {"reset": 0, "restore": 0, "branch": 0, "read-only": 0}
+    for trial in range(trials):
+        rng = np.random.default_rng(trial)
+        params, size = make_env(rng)
+
+        # built with the default size and resized, like DeliveryVectorEnv.set_params
+        env = DeliveryEnv(**params)
+        env.set_params(obj_size=(size, size))
+        env.reset()
+        play(env, random_actions(rng, int(rng.integers(20, 600))))
+        actions = random_actions(rng, steps)
+
+        # get_state on the way against the same run without it
+        state = env.get_state()
+        env.set_state(state)
+        plain = play(env, actions)
+        env.set_state(state)
+        trajectory = np.empty_like(plain)
+        for i, action in enumerate(actions):
+            if i % 7 == 0:
+                env.get_state()
+            trajectory[i] = play(env, [action])[0]
+        failures["read-only"] += not np.array_equal(plain, trajectory)
+
+        # reset against a new env
+        env.set_state(state)
+        env.reset()
+        fresh = DeliveryEnv(**params)
+        fresh.set_params(obj_size=(size, size))
+        fresh.reset()
+        failures["reset"] += not np.array_equal(play(env, actions), play(fresh, actions))
+
+        # restore into an env with another history, against the env the state comes from
+        env.set_state(state)
+        play(env, random_actions(rng, int(rng.integers(20, 600))))
+        env.canonicalize()
+        state = env.get_state()
+        other = DeliveryEnv(**params)
+        other.set_params(obj_size=(size, size))
+        other.reset()
+        play(other, random_actions(rng, int(rng.integers(20, 600))))
+        other.set_state(state)
+        original = play(env, actions)
+        failures["restore"] += not np.array_equal(original, play(other, actions))
+
+        # branch twice from the same state
+        env.set_state(state)
+        failures["branch"] += not np.array_equal(original, play(env, actions))
+
+    print(f"{trials} trials of {steps} steps, trajectories that differ: " +
+          ", ".join(f"{name} {count}" for name, count in failures.items()))
+
+    env = DeliveryEnv()
+    env.reset()
+    play(env, random_actions(np.random.default_rng(0), 100))
+    iterations = 2000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        state = env.get_state()
+    get_time = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(iterations):
+        env.set_state(state)
+    set_time = (time.perf_counter() - start) / iterations * 1e6
+    start = time.perf_counter()
+    for _ in range(200):
+        DeliveryEnv().reset()
+    new_time = (time.perf_counter() - start) / 200 * 1e6
+    print(f"get_state {get_time:.0f} us, set_state {set_time:.0f} us, new env {new_time:.0f} us")
+
+    assert not any(failures.values()), failures
@@ -0,0 +1,88 @@
+# Exactness check of DeliveryVectorEnv/SharedMemoryDeliveryVectorEnv get_state/set_state, the env
+# part of the trainer checkpoints (checkpoint.py).
+#
+# usage: python benchmarks/exact_vector_env_state.py [trials] [steps]
+#
+# An env runs a random number of steps, is canonicalised (as the trainers do after every update),
+# its state is saved (pickled like in a checkpoint) and restored into a new env with the same
+# settings, then both get the same actions for `steps` steps. Observations, rewards, terminations,
+# truncations and final observations have to be equal to the bit, over episodes ending in drops,
+# deliveries and truncations (autoresets).
+
+import os, pickle, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from vector_env import DeliveryVectorEnv
+from shm_vector_env import SharedMemoryDeliveryVectorEnv
+
+
+def random_actions(rng, steps, num_envs):
+    # piecewise-constant speeds per env, slow ones (deliveries) and fast ones (drops)
+    actions = np.empty((steps, num_envs, 1))
+    for i in range(num_envs):
+        levels = np.where(rng.random(steps // 20 + 1) < 0.5, rng.uniform(0, 3, steps // 20 + 1), rng.uniform(-20, 60, steps // 20 + 1))
+        actions[:, i, 0] = np.repeat(levels, 20)[:steps]
+    return actions
+
+
+def play(envs, actions):
+    outputs, ends = [], 0
+    for action in actions:
+        obs, reward, terminated, truncated, infos = envs.step(action)
+        final = infos.get("final_observation")
+        finals = None if final is None else [None if value is None else value.copy() for value in final]
+        outputs.append((obs.copy(), reward.copy(), terminated.copy(), truncated.copy(), finals))
+        ends += int((terminated | truncated).sum())
+    return outputs, ends
+
+
+def same(a, b):
+    for step_a, step_b in zip(a, b):
+        for x, y in zip(step_a[:4], step_b[:4]):
+            if not np.array_equal(x, y):
+                return False
+        if (step_a[4] is None) != (step_b[4] is None):
+            return False
+        if step_a[4] is not None and not all((x is None and y is None) or np.array_equal(x, y) for x, y in zip(step_a[4], step_b[4])):
+            return False
+    return len(a) == len(b)
+
+
+if __name__ == "__main__":
+
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    steps = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    num_envs = 4
+    settings = {"normalize_obs": True, "max_episode_steps": 250, "obj_mass": 3.0, "obj_friction": 0.5}
+
+    backends = {
+        "native": lambda: DeliveryVectorEnv(num_envs, **settings),
+        "shm": lambda: SharedMemoryDeliveryVectorEnv(num_envs, num_workers=2, **settings),
+    }
+    for name, make in backends.items():
+        failures, total_ends = 0, 0
+        for trial in range(trials):
+            rng = np.random.default_rng(trial)
+            envs = make()
+            envs.reset()
+            play(envs, random_actions(rng, int(rng.integers(10, 400)), num_envs))
+            envs.canonicalize()
+            state = pickle.loads(pickle.dumps(envs.get_state()))
+
+            actions = random_actions(rng, steps, num_envs)
+            original, ends = play(envs, actions)
+            envs.close()
+
+            restored_envs = make()
+            restored_envs.reset()
+            restored_envs.set_state(state)
+            restored, _ = play(restored_envs, actions)
+            restored_envs.close()
+
+            failures += not same(original, restored)
+            total_ends += ends
+        print(f"{name:>6}: {trials} trials of {steps} steps x {num_envs} envs, {total_ends} episode ends, {failures} restored runs differ")
+        assert total_ends > 0 and failures == 0
@@ -0,0 +1,116 @@
+# Fidelity harness of the reduced-physics backend (reduced_env.py) against the Box2D DeliveryEnv.
+#
+# usage: python benchmarks/fidelity_reduced_env.py [max_steps]
+#
+# Both backends are driven by the same action sequences for every mass/friction condition of the
+# data/Eval-* experiments. The trajectories are compared step by step on the raw observation
+# (tray x, tray vx, box x, box vx, diff) together with the reward and the termination step.
+# A condition is marked "ok" when every sequence ends on the same step with the same reward and
+# the deviation (diff) error stays below DIFF_TOLERANCE pixels.
+
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from env import DeliveryEnv
+from reduced_env import ReducedDeliveryVectorEnv
+
+
+# Conditions of the data/Eval-* experiments: (name, obj_mass in kg, obj_friction)
+CONDITIONS = [
+    ("30g-0.5f", 0.03, 0.5),
+    ("300g-0.5f", 0.3, 0.5),
+    ("3kg-0.5f", 3.0, 0.5),
+    ("30g-1.0f", 0.03, 1.0),
+    ("300g-1.0f", 0.3, 1.0),
+    ("3kg-1.0f", 3.0, 1.0),
+]
+
+DIFF_TOLERANCE = 0.2
+
+
+def action_sequences(max_steps, seed=0):
+    # constant speeds of the tray and random piecewise-constant speed profiles (action = speed / 10)
+    rng = np.random.default_rng(seed)
+    sequences = [np.full(max_steps, value) for value in (0.5, 1.0, 2.0, 5.0, 20.0, 60.0)]
+    for _ in range(6):
+        levels = rng.uniform(0, 8, size=max_steps // 20 + 1)
+        sequences.append(np.repeat(levels, 20)[:max_steps])
+    return np.array(sequences)
+
+
+def run_box2d(obj_mass, obj_friction, actions):
+    env = DeliveryEnv(obj_mass=obj_mass, obj_friction=obj_friction)
+    env.reset()
+    trajectory, rewards = [], []
+    for action in actions:
+        obs, reward, terminal, _, _ = env.step(action)
+        trajectory.append(obs)
+        rewards.append(reward)
+        if terminal:
+            break
+    env.close()
+    return np.array(trajectory), np.array(rewards)
+
+
+def run_reduced(obj_mass, obj_friction, sequences):
+    # all sequences are simulated at once, finished envs are ignored afterwards
+    num_envs, max_steps = sequences.shape
+    envs = ReducedDeliveryVectorEnv(num_envs, record_stats=False, obj_mass=obj_mass, obj_friction=obj_friction)
+    envs.reset()
+
+    trajectories = np.zeros((max_steps, num_envs, 5))
+    rewards = np.zeros((max_steps, num_envs))
+    lengths = np.full(num_envs, max_steps)
+    for step in range(max_steps):
+        _, _, _, _, infos = envs.step(sequences[:, step:step+1])
+        trajectories[step] = envs.raw_obs
+        # finished envs are already reset, their last observation is in the infos
+        for i in np.flatnonzero(infos.get("_final_observation", [])):
+            trajectories[step, i] = infos["final_observation"][i]
+        rewards[step] = envs.rewards
+        lengths = np.where((lengths == max_steps) & envs.terminations, step + 1, lengths)
+    envs.close()
+
+    return [(trajectories[:length, i], rewards[:length, i]) for i, length in enumerate(lengths)]
+
+
+def compare(obj_mass, obj_friction, sequences):
+    results = []
+    reduced = run_reduced(obj_mass, obj_friction, sequences)
+    for actions, (traj_r, rew_r) in zip(sequences, reduced):
+        traj_b, rew_b = run_box2d(obj_mass, obj_friction, actions)
+        steps = min(len(traj_b), len(traj_r))
+        error = np.abs(traj_b[:steps] - traj_r[:steps]).max(axis=0)
+        results.append({
+            "steps_box2d": len(traj_b),
+            "steps_reduced": len(traj_r),
+            "same_end": len(traj_b) == len(traj_r) and rew_b[-1] == rew_r[-1],
+            "error": error,
+        })
+    return results
+
+
+if __name__ == "__main__":
+
+    max_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    sequences = action_sequences(max_steps)
+
+    print(f"{len(sequences)} action sequences, up to {max_steps} steps each")
+    print(f"{'condition':>10} {'same end':>9} {'|d tray x|':>11} {'|d box x|':>10} {'|d box vx|':>11} {'|d diff|':>9}  safe")
+    all_ok = True
+    for name, obj_mass, obj_friction in CONDITIONS:
+        results = compare(obj_mass, obj_friction, sequences)
+        same_end = sum(r["same_end"] for r in results)
+        error = np.max([r["error"] for r in results], axis=0)
+        ok = same_end == len(results) and error[4] < DIFF_TOLERANCE
+        all_ok &= ok
+        print(f"{name:>10} {same_end:>4d}/{len(results):<4d} {error[0]:11.3f} {error[2]:10.3f} {error[3]:11.3f} {error[4]:9.3f}  {'ok' if ok else 'NO'}")
+
+        for i, r in enumerate(results):
+            if not r["same_end"]:
+                print(f"{'':>10} sequence {i}: {r['steps_box2d']} steps (Box2D) vs {r['steps_reduced']} steps (reduced)")
+
+    print("reduced backend is", "within" if all_ok else "NOT within", "tolerance on the evaluation grid")
@@ -0,0 +1,211 @@
+# Checkpoints of the PPO trainers (continuous_ppo.py, load_RL_model.py).
+#
+# A checkpoint is taken between two updates and holds everything the rest of the run depends on:
+#   agent and optimizer state_dicts, global_step and update number, the RNG states (torch, CUDA,
+#   NumPy global, random), the env state (worlds, observation-normaliser statistics, running
+#   episodes, see DeliveryVectorEnv.get_state) and the last row of the rollout buffer.
+# snapshot() only reads the run, taking checkpoints does not change it. A run resumed from it with
+# restore() goes on bit for bit like the run that was not stopped (same settings and device, an env
+# backend with get_state: "native" or "shm", worlds canonicalised after every update by the
+# trainers, see DeliveryVectorEnv.get_state). The gymnasium
+# AsyncVectorEnv pool has no env state to save: the run is resumed with new episodes and new
+# normaliser statistics.
+#
+# snapshot() copies the state on the training thread (about 3 ms for 24 envs, an update takes
+# seconds); CheckpointWriter serialises and writes it in a background thread, so the training
+# loop never waits for the disk. When a checkpoint comes while the previous one is still written,
+# the one waiting is replaced by the newer one. Each file is written to a temporary file, flushed
+# to the disk and renamed, a crash never leaves a partial checkpoint; the last `keep` ones are kept.
+#
+# usage:
+#   writer = CheckpointWriter(f"runs/checkpoints/{run_name}")
+#   writer.save(snapshot(agent, optimizer, envs, rollout, global_step, update, run_name=run_name), update)
+#   ...
+#   writer.close()                                  # waits for the last checkpoint
+#
+#   checkpoint = load_checkpoint("runs/checkpoints/<run_name>")       # file or directory (latest)
+#   global_step, update = restore(checkpoint, agent, optimizer, envs, rollout)
+#   mean, var = obs_stats(checkpoint)                 # normaliser of the agent, see evaluate_policy.py
+
+import glob
+import os
+import random
+import threading
+
+import numpy as np
+import torch
+
+from vector_env import pool_obs_stats
+
+
+def to_cpu(value):
+    # copy of a (nested) state_dict with every tensor cloned to the CPU
+    if isinstance(value, torch.Tensor):
+        return value.detach().to("cpu", copy=True)
+    if isinstance(value, dict):
+        return {key: to_cpu(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(to_cpu(item) for item in value)
+    return value
+
+
+def rng_state():
+    return {
+        "torch": torch.get_rng_state(),
+        "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None,
+        "numpy": np.random.get_state(),
+        "random": random.getstate(),
+    }
+
+
+def set_rng_state(state):
+    torch.set_rng_state(state["torch"])
+    if state["cuda"] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+    np.random.set_state(state["numpy"])
+    random.setstate(state["random"])
+
+
+def snapshot(agent, optimizer, envs, rollout, global_step, update, **extra):
+    # state of the run after `update` updates; extra entries (e.g. run_name, elapsed time) are saved as they are
+    return {
+        "agent": to_cpu(agent.state_dict()),
+        "optimizer": to_cpu(optimizer.state_dict()),
+        "envs": envs.get_state() if hasattr(envs, "get_state") else None,
+        "rollout": rollout.get_state(),
+        "rng": rng_state(),
+        "global_step": global_step,
+        "update": update,
+        **extra,
+    }
+
+
+def restore(checkpoint, agent, optimizer, envs, rollout):
+    # puts the run back in the state of the checkpoint, returns (global_step, update)
+    agent.load_state_dict(checkpoint["agent"])
+    optimizer.load_state_dict(checkpoint["optimizer"])
+    if checkpoint["envs"] is not None and hasattr(envs, "set_state"):
+        envs.set_state(checkpoint["envs"])
+        rollout.set_state(checkpoint["rollout"])
+    else:
+        print("Checkpoint without env state for this env backend, the episodes start again")
+        rollout.reset(envs)
+    set_rng_state(checkpoint["rng"])
+    return checkpoint["global_step"], checkpoint["update"]
+
+
+def obs_stats(checkpoint):
+    # (mean, var) of the observation normaliser of the checkpoint, pooled over its envs (None when
+    # the checkpoint has no env state), e.g. DeliveryVectorEnv(obs_stats=...) to evaluate its agent
+    envs = checkpoint["envs"]
+    if envs is None:
+        return None
+    # "shm" backend: one state per worker
+    states = envs if isinstance(envs, list) else [envs]
+    if states[0]["obs_rms"] is None:
+        return None
+    mean, var, count = (np.concatenate(arrays) for arrays in zip(*(state["obs_rms"] for state in states)))
+    return pool_obs_stats(mean, var, count)
+
+
+def checkpoint_path(directory, update):
+    return os.path.join(directory, f"checkpoint_{update:08d}.pt")
+
+
+def latest_checkpoint(directory):
+    paths = sorted(glob.glob(os.path.join(directory, "checkpoint_*.pt")))
+    return paths[-1] if paths else None
+
+
+def load_checkpoint(path, map_location="cpu"):
+    # path of a checkpoint file, or of a directory for its latest checkpoint
+    if os.path.isdir(path):
+        directory, path = path, latest_checkpoint(path)
+        if path is None:
+            raise FileNotFoundError(f"No checkpoint in {directory}")
+    # the checkpoint holds NumPy arrays and the RNG states, not only tensors
+    return torch.load(path, map_location=map_location, weights_only=False)
+
+
+def atomic_save(obj, path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        torch.save(obj, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    # the rename itself is only on the disk once the directory is flushed (not possible on Windows)
+    if os.name != "nt":
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class CheckpointWriter:
+
+    def __init__(self, directory, keep=3):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+        self.pending = None                             # (checkpoint, path) waiting for the writer
+        self.writing = False
+        self.error = None
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="CheckpointWriter", daemon=True)
+        self.thread.start()
+
+    def save(self, checkpoint, update):
+        # returns at once, the checkpoint is written by the background thread
+        with self.condition:
+            self.raise_error()
+            self.pending = (checkpoint, checkpoint_path(self.directory, update))
+            self.condition.notify()
+
+    def wait(self):
+        # until the checkpoints given to save are on the disk
+        with self.condition:
+            while self.pending is not None or self.writing:
+                self.condition.wait()
+            self.raise_error()
+
+    def close(self):
+        self.wait()
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("Writing the checkpoint failed") from error
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                (checkpoint, path), self.pending = self.pending, None
+                self.writing = True
+
+            try:
+                atomic_save(checkpoint, path)
+                self.prune()
+            except Exception as error:
+                with self.condition:
+                    self.error = error
+
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    def prune(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, "checkpoint_*.pt")))
+        for path in paths[:max(len(paths) - self.keep, 0)]:
+            os.remove(path)
@@ -0,0 +1,104 @@
+# Convergence monitoring of the ICO/ISO learner runs.
+#
+# A learner run only ends by itself with two deliveries ("done") or a weight over 1 ("failed").
+# ConvergenceMonitor watches the run tick by tick and stops it as soon as it can not end that way
+# anymore, with a reason code:
+#   "failed"         : divergence, the weight is not a finite number (a weight over 1 is already
+#                      a failure of Learner on the next tick)
+#   "stationary"     : window attempts in a row ended without a delivery and without the weight
+#                      changing more than tol, the learning has stalled
+#   "oscillating"    : window attempts in a row ended alternately with a drop (object out of the
+#                      learning area, too fast) and a stop (speed under 1, too slow)
+#   "attempt_budget" : one attempt took more than attempt_ticks ticks, or the run needs more than
+#                      max_attempts attempts
+# The other outcomes of learner_sim.run are "done", "max_ticks" and "quit" (window closed).
+# vector_learner.VectorLearner does the same checks for a population of learners.
+
+import math
+
+
+DONE, FAILED, STATIONARY, OSCILLATING, ATTEMPT_BUDGET = "done", "failed", "stationary", "oscillating", "attempt_budget"
+
+# how an attempt ended
+DELIVERED, DROPPED, STOPPED = range(3)
+
+
+# ConvergenceMonitor settings of a command line argument (headless_runner.py, eval_grid.py):
+# "monitor" for the defaults, or e.g. "window=5,attempt_ticks=5000" (window, tol, attempt_ticks,
+# max_attempts). A dict and not a monitor, so it can be sent to the worker processes of eval_grid.
+def parse_settings(arg):
+    settings = {}
+    if arg == "monitor":
+        return settings
+    for item in arg.split(","):
+        key, value = item.split("=")
+        if key not in ("window", "tol", "attempt_ticks", "max_attempts"):
+            raise ValueError(f"unknown ConvergenceMonitor setting {key!r}")
+        settings[key] = float(value) if key == "tol" else int(value)
+    return settings
+
+
+class ConvergenceMonitor:
+
+    def __init__(self, window=10, tol=1e-6, attempt_ticks=10000, max_attempts=None):
+        self.window = window
+        self.tol = tol
+        self.attempt_ticks = attempt_ticks
+        self.max_attempts = max_attempts
+
+        self.reason = None
+        self.ticks = 0                                  # ticks of the current attempt
+        self.redo = 0
+        self.wa_end = None                              # weight at the end of the last attempt
+        self.last_end = None                            # DELIVERED, DROPPED or STOPPED
+        self.still = 0                                  # attempts in a row without weight change
+        self.alternating = 0                            # attempts in a row alternating drop/stop
+
+    def stop(self, reason):
+        self.reason = reason
+        return reason
+
+    # Called after every learner.tick with its (speed, reset). Returns the reason code when the run
+    # has to stop, None otherwise.
+    def update(self, learner, speed, reset):
+        wa = learner.wa
+        if not math.isfinite(wa):
+            return self.stop(FAILED)
+        if self.wa_end is None:
+            self.wa_end = wa
+
+        self.ticks += 1
+        if not reset:
+            if self.ticks > self.attempt_ticks:
+                return self.stop(ATTEMPT_BUDGET)
+            return None
+
+        # end of an attempt
+        self.ticks = 0
+        if learner.redo > self.redo:
+            end = DELIVERED
+            self.redo = learner.redo
+        elif speed is None:
+            end = DROPPED
+        else:
+            end = STOPPED
+
+        if end == DELIVERED:
+            self.still = 0
+            self.alternating = 0
+        else:
+            self.still = self.still + 1 if abs(wa - self.wa_end) <= self.tol else 0
+            alternate = self.last_end is not None and self.last_end != DELIVERED and end != self.last_end
+            self.alternating = self.alternating + 1 if alternate else 0
+        self.wa_end = wa
+        self.last_end = end
+
+        if learner.done():
+            return None
+        if self.still >= self.window:
+            return self.stop(STATIONARY)
+        if self.alternating >= self.window:
+            return self.stop(OSCILLATING)
+        if self.max_attempts is not None and learner.attempt > self.max_attempts:
+            return self.stop(ATTEMPT_BUDGET)
+        return None
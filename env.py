@@ -1,4 +1,3 @@
-import pygame
 import Box2D
 import time, sys, os
 import random
@@ -9,104 +8,296 @@ import numpy as np
 import gymnasium as gym
 
 
-class DeliveryEnv(gym.Env):
-    metadata = {}
+# Layout of the flat body-state array (DeliveryEnv.read_body_state, one row per env in the vector envs)
+RECT_X, RECT_VX, SQUARE_X, SQUARE_VX = range(4)
+STATE_SIZE = 4
 
-    def __init__(self, display=False):
 
+class DeliveryEnv(gym.Env):
+    metadata = {"render_modes": ["human"], "render_fps": 1000}
 
-        # gym setup
-        self.observation_space = spaces.Box(low=-1000, high=1000, shape=(5,), dtype=np.float32)
-        self.action_space = spaces.Box(low=-1000, high=1000, shape=(1,), dtype=np.float32)
+    # gym setup
+    observation_space = spaces.Box(low=-1000, high=1000, shape=(5,), dtype=np.float32)
+    action_space = spaces.Box(low=-1000, high=1000, shape=(1,), dtype=np.float32)
 
-        SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
+    def __init__(self, display=False, render_mode=None, realtime=None, obj_mass=0.3, obj_friction=1.0, obj_size=(0.25, 0.25),
+                 rect_mass=10, rect_friction=1.0, rect_size=(1, 0.25), gravity=9.81, fast_forward=False, obs_noise=None):
+
+        # display=True is the same as render_mode="human"
         if display:
-            pygame.init()
-            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            render_mode = "human"
+        self.render_mode = render_mode
+        display = render_mode == "human"
+        self.display = display
 
+        # real-time pacing is only used when the window is shown by default,
+        # headless envs (e.g. RL workers) step as fast as Box2D allows
+        if realtime is None:
+            realtime = display
+        self.realtime = realtime
 
+        SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600
         self.SCREEN_WIDTH = SCREEN_WIDTH
         self.SCREEN_HEIGHT = SCREEN_HEIGHT
         self.TARGET_FPS = 1000 #60
         self.TIME_STEP  = 1.0 / self.TARGET_FPS
 
-        self.clock = pygame.time.Clock()
+        # sleep-aware fast-forward of the steady motion (see simulate), not used with real-time pacing
+        self.fast_forward = fast_forward and not realtime
+        self.FF_TOLERANCE = 1e-3                        # px and px/s
+        self.FF_RESYNC = 20                             # real step after this many fast-forwarded steps
+        self.clear_fast_forward()
 
+        # x and vx of both bodies, read from Box2D once per step (see read_body_state)
+        self.body_state = np.zeros(STATE_SIZE, dtype=np.float64)
+        self.body_state_valid = False
+        self.sensed = np.zeros(2)                       # noisy (rect_x, square_x), see write_observation
 
-        self.world = Box2D.b2World(gravity=(0, -9.81))
+        # sensor noise of the observation (noise.NoiseStream/NoiseChain), on the sensed positions only
+        # (rect_x, square_x, as the object position of the templates); the velocities are exact and the
+        # deviation is the one of the noisy positions. Reseeded by reset(seed=...); reward and
+        # termination use the true state
+        self.obs_noise = obs_noise
+
+        # pygame is only imported (and SDL initialised) when it is actually needed
+        self.renderer = None
+        self.clock = None
+        if realtime:
+            from renderer import make_clock
+            self.clock = make_clock()
+
+
+        self.world = Box2D.b2World(gravity=(0, -gravity))
         PPM = 200     
 
         WALL_WIDTH = 1 
-        WALL_COLOR = (0, 0, 0)
         self.WALL_WIDTH = WALL_WIDTH
-        self.WALL_COLOR = WALL_COLOR
-        ceiling_body = self.world.CreateStaticBody(position=(0, SCREEN_HEIGHT), shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (SCREEN_WIDTH, 0)]))
-        left_wall_body = self.world.CreateStaticBody(position=(0, 0), shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (0, SCREEN_HEIGHT)]))
-        right_wall_body = self.world.CreateStaticBody(position=(SCREEN_WIDTH, 0), shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (0, SCREEN_HEIGHT)]))
-        ground_body = self.world.CreateStaticBody(position=(0, WALL_WIDTH)) 
+        ceiling_body = self.world.CreateStaticBody(position=(0, SCREEN_HEIGHT), userData="ceiling", shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (SCREEN_WIDTH, 0)]))
+        left_wall_body = self.world.CreateStaticBody(position=(0, 0), userData="left_wall", shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (0, SCREEN_HEIGHT)]))
+        right_wall_body = self.world.CreateStaticBody(position=(SCREEN_WIDTH, 0), userData="right_wall", shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (0, SCREEN_HEIGHT)]))
+        ground_body = self.world.CreateStaticBody(position=(0, WALL_WIDTH), userData="ground") 
         ground_shape = Box2D.b2EdgeShape(vertices=[(0, 0), (SCREEN_WIDTH, 0)])
         ground_fixture = ground_body.CreateFixture(shape=ground_shape, density=1.0, friction=1.0)
 
 
+        # tray and object; their shapes are built by set_geometry (also used by set_params)
+        self.PPM = PPM
+        self.FAR_AWAY = (-100 * SCREEN_WIDTH, -100 * SCREEN_HEIGHT)   # outside of everything, see set_state
+        self.rect_body = self.world.CreateDynamicBody(position=(0, 0), angle =0.0, userData="tray")
+        self.square_body = self.world.CreateDynamicBody(position=(0, 0), angle =0.0, userData="object")
+        self.rect_fixture = None
+        self.square_fixture = None
+
+        # physical properties, see set_params
+        self.rect_mass = rect_mass                      # kg unit
+        self.rect_friction = rect_friction
+        self.obj_mass = obj_mass                        # kg unit
+        self.obj_friction = obj_friction
+        self.gravity = gravity
+        self.set_geometry(rect_size, obj_size)
+
+        # reset() goes back to the initial state built by set_geometry.
+        # One step is taken first so that the world has a previous time step like any stepped world
+        # (Box2D scales the restored warm-starting impulses with it, a never-stepped world drops them)
+        self.world.Step(self.TIME_STEP, 1, 1)
+        self.set_state(self.initial_state)
+
+        if display:
+            from renderer import DeliveryRenderer
+            self.renderer = DeliveryRenderer(self)
+
+
+    def set_geometry(self, rect_size, obj_size):
+        PPM = self.PPM
+
         # tray setup
-        RECT_COLOR = (255, 0, 0)
-        self.RECT_COLOR = RECT_COLOR
-        rect_width = 1 * PPM
+        self.rect_size = tuple(rect_size)               # (width, height) meter unit
+        rect_width = rect_size[0] * PPM
         self.rect_width = rect_width
-        rect_height = 0.25 * PPM
+        rect_height = rect_size[1] * PPM
         self.rect_height = rect_height
         rect_center = (rect_width/2, rect_height/2)
         self.rect_center = rect_center
         rect_position = (rect_center[0], rect_center[1])
         self.rect_position = rect_position
-        rect_mass = 10
-        rect_density = rect_mass * 1 * 0.25 
-        rect_friction = 1.0
-
-        self.rect_body = self.world.CreateDynamicBody(position= (rect_position), angle =0.0)
-        rect_shape = Box2D.b2PolygonShape(box= rect_center)
-        rect_fixture = self.rect_body.CreateFixture(shape=rect_shape, density=rect_density, friction=rect_friction)
 
         # object on tray
-        SQUARE_COLOR = (0, 0, 255)
-        self.SQUARE_COLOR = SQUARE_COLOR
-        square_width = 0.25 * PPM 
+        self.obj_size = tuple(obj_size)                 # (width, height) meter unit
+        square_width = obj_size[0] * PPM
         self.square_width =square_width
-        square_height = 0.25 * PPM  
+        square_height = obj_size[1] * PPM
         self.square_height = square_height
         square_center = (square_width/2, square_height/2) 
         self.square_center = square_center
         square_position = (rect_center[0], rect_height+square_height/2)
         self.square_position = square_position
-        obj_mass = 0.3
-        obj_density = obj_mass * 0.25 * 0.25 
-        obj_friction = 1.0
 
-        self.square_body = self.world.CreateDynamicBody(position= square_position, angle =0.0)
+        # new shapes on the same bodies
+        if self.rect_fixture is not None:
+            self.rect_body.DestroyFixture(self.rect_fixture)
+            self.square_body.DestroyFixture(self.square_fixture)
+        rect_shape = Box2D.b2PolygonShape(box= rect_center)
+        self.rect_fixture = self.rect_body.CreateFixture(shape=rect_shape, density=self.rect_density(), friction=self.rect_friction)
         square_shape = Box2D.b2PolygonShape(box=square_center) 
-        square_fixture = self.square_body.CreateFixture(shape=square_shape, density=obj_density, friction= obj_friction) 
+        self.square_fixture = self.square_body.CreateFixture(shape=square_shape, density=self.obj_density(), friction= self.obj_friction) 
+
+        # both bodies at rest at their initial position, no contact yet
+        self.initial_state = {"bodies": np.array([rect_position + (0, 0, 0, 0, 1),
+                                                  square_position + (0, 0, 0, 0, 1)], dtype=np.float64),
+                              "contacts": ()}
+
+    # The density is calculated from mass*area (in 2D), the same way as the templates
+    def rect_density(self):
+        return self.rect_mass * self.rect_size[0] * self.rect_size[1]
+
+    def obj_density(self):
+        return self.obj_mass * self.obj_size[0] * self.obj_size[1]
+
+    # Change the physical properties of the live world without rebuilding it: fixtures, mass data
+    # and gravity are updated in place. Sizes are (width, height) in meter; a new size replaces the
+    # fixture of the body and the new initial positions are used from the next reset().
+    def set_params(self, obj_mass=None, obj_friction=None, obj_size=None,
+                   rect_mass=None, rect_friction=None, rect_size=None, gravity=None):
+        self.clear_fast_forward()
+        if obj_mass is not None:
+            self.obj_mass = float(obj_mass)
+        if obj_friction is not None:
+            self.obj_friction = float(obj_friction)
+        if rect_mass is not None:
+            self.rect_mass = float(rect_mass)
+        if rect_friction is not None:
+            self.rect_friction = float(rect_friction)
+
+        if obj_size is not None or rect_size is not None:
+            self.set_geometry(self.rect_size if rect_size is None else [float(v) for v in rect_size],
+                              self.obj_size if obj_size is None else [float(v) for v in obj_size])
+        else:
+            self.rect_fixture.density = self.rect_density()
+            self.rect_fixture.friction = self.rect_friction
+            self.square_fixture.density = self.obj_density()
+            self.square_fixture.friction = self.obj_friction
+        self.rect_body.ResetMassData()
+        self.square_body.ResetMassData()
+
+        # the contacts keep the mixed friction of their creation
+        for contact in self.world.contacts:
+            contact.ResetFriction()
+
+        if gravity is not None:
+            self.gravity = float(gravity)
+            self.world.gravity = (0, -self.gravity)
 
 
     def reset(self, seed=None, options=None):
-        self.rect_body.linearVelocity = (0, 0)
-        self.rect_body.position = self.rect_position
-        self.square_body.linearVelocity = (0,0)
-        self.square_body.position = self.square_position
+        self.set_state(self.initial_state)
+        if self.obs_noise is not None:
+            if seed is not None:
+                self.obs_noise.seed(seed)
+            self.obs_noise.reset()
 
         return self.get_observation(), {}
 
 
+    # World-state snapshot: both dynamic bodies and the warm-starting impulses of the contacts.
+    # Box2D also keeps state that can not be read back: the order of its contact list (the solver
+    # order), the enlarged broad-phase bounds of the bodies (they decide when a contact is created)
+    # and the sleep timers. set_state therefore puts the world in a canonical form that only depends
+    # on the snapshot: the contacts are destroyed and created again in a fixed order, the bounds are
+    # rebuilt around the bodies and the sleep timers restart from 0. Envs restored from the same
+    # snapshot (or the same env restored again, e.g. reset() and a new env) go on with exactly the
+    # same simulation, and many rollouts can be branched from one saved state without building a new
+    # b2World. Envs built with the same settings (same sizes, same set_params calls) are interchangeable.
+    # get_state only reads the world. The env it comes from goes on exactly like the restored ones
+    # only when its world is in the canonical form too: call canonicalize() first (it changes the
+    # rest of the simulation a little, so call it at fixed points, e.g. every update of a trainer,
+    # and not only when a snapshot is taken).
+    def get_state(self):
+        bodies = np.array([(body.position.x, body.position.y, body.angle,
+                            body.linearVelocity.x, body.linearVelocity.y, body.angularVelocity,
+                            body.awake)
+                           for body in (self.rect_body, self.square_body)], dtype=np.float64)
+
+        contacts = tuple((contact.fixtureA.body.userData, contact.fixtureB.body.userData,
+                          tuple((point.id.key, point.normalImpulse, point.tangentImpulse) for point in contact.manifold.points))
+                         for contact in self.world.contacts)
+
+        return {"bodies": bodies, "contacts": contacts}
+
+    def canonicalize(self):
+        # puts the world in the canonical form of set_state, without changing the bodies
+        self.set_state(self.get_state())
+
+    def set_state(self, state):
+        self.clear_fast_forward()
+        self.body_state_valid = False
+
+        # contacts are created again below, in the order of the broad-phase pairs
+        contact_manager = self.world.contactManager
+        for contact in self.world.contacts:
+            contact_manager.Destroy(contact)
+
+        bodies = (self.rect_body, self.square_body)
+        # away and back: the broad-phase bounds are rebuilt around the new position, whatever they were
+        for body in bodies:
+            body.transform = (self.FAR_AWAY, 0)
+        for body, (x, y, angle, vx, vy, w, awake) in zip(bodies, state["bodies"]):
+            body.transform = ((x, y), angle)
+            # a body put to sleep restarts its sleep timer (and loses its velocity)
+            body.awake = False
+            if awake:
+                body.awake = True
+                body.linearVelocity = (vx, vy)
+                body.angularVelocity = w
+
+        # create the contacts of the new positions, then restore the saved impulses (none for a fresh contact)
+        contact_manager.FindNewContacts()
+        saved = {(body_a, body_b): points for body_a, body_b, points in state["contacts"]}
+        for contact in self.world.contacts:
+            points = saved.get((contact.fixtureA.body.userData, contact.fixtureB.body.userData), ())
+            manifold = contact.manifold
+            manifold.pointCount = len(points)
+            for point, (key, normal_impulse, tangent_impulse) in zip(manifold.points, points):
+                point.id.key = key
+                point.normalImpulse = normal_impulse
+                point.tangentImpulse = tangent_impulse
+
+
+    # Every b2Body attribute access goes through SWIG and creates a temporary b2Vec2, so the values
+    # used by the observation, reward and termination are read once after each physics step into
+    # self.body_state (RECT_X, RECT_VX, SQUARE_X, SQUARE_VX) and reused until the bodies move again.
+    # Code moving the bodies by hand has to set self.body_state_valid = False.
+    def read_body_state(self):
+        if not self.body_state_valid:
+            state = self.body_state
+            state[RECT_X] = self.rect_body.position.x
+            state[RECT_VX] = self.rect_body.linearVelocity.x
+            state[SQUARE_X] = self.square_body.position.x
+            state[SQUARE_VX] = self.square_body.linearVelocity.x
+            self.body_state_valid = True
+        return self.body_state
+
     def get_observation(self):
-        diff      =  self.rect_body.position.x - self.square_body.position.x
-        return np.array((self.rect_body.position.x, 
-                         self.rect_body.linearVelocity.x,
-                         self.square_body.position.x,
-                         self.square_body.linearVelocity.x,
-                         diff))
+        obs = np.empty(STATE_SIZE + 1, dtype=np.float32)
+        self.write_observation(obs)
+        return obs
+
+    def write_observation(self, obs):
+        # the observation (rect_x, rect_vx, square_x, square_vx, rect_x - square_x) into a (5,) array
+        state = self.read_body_state()
+        obs[:STATE_SIZE] = state
+        rect_x, square_x = state[RECT_X], state[SQUARE_X]
+        if self.obs_noise is not None:
+            sensed = self.sensed
+            sensed[0], sensed[1] = rect_x, square_x
+            self.obs_noise.apply_into(sensed)
+            rect_x, square_x = sensed[0], sensed[1]
+            obs[RECT_X], obs[SQUARE_X] = rect_x, square_x
+        obs[4] = rect_x - square_x
 
     def get_reward(self):
         
-        diff_x = (self.rect_body.position.x-self.square_body.position.x)
+        state = self.read_body_state()
+        diff_x = (state[RECT_X]-state[SQUARE_X])
         # reward manipulation
         
         reward = 0 
@@ -116,7 +307,7 @@ class DeliveryEnv(gym.Env):
             reward += -1
 
         # success delivery
-        if self.rect_body.position.x >=699:
+        if state[RECT_X] >=699:
             reward += 1
         
         # distance to the goal
@@ -130,9 +321,10 @@ class DeliveryEnv(gym.Env):
     def terminate_cond(self):
 
         # calculate object deviation
-        diff_x = (self.rect_body.position.x-self.square_body.position.x)
+        state = self.read_body_state()
+        diff_x = (state[RECT_X]-state[SQUARE_X])
         # reward manipulation
-        if diff_x > 30 or self.rect_body.position.x >=699:
+        if diff_x > 30 or state[RECT_X] >=699:
             terminated = 1
         else:
             terminated = 0
@@ -140,58 +332,135 @@ class DeliveryEnv(gym.Env):
         return terminated
 
 
-    def step(self, action):
+    def simulate(self, action):
 
         # rescale action
         action = float(action) * 10
 
+        # steady motion with the same action: move both bodies without solving the contacts
+        if self.ff_step is not None and self.ff_step[0] == action and self.ff_count < self.FF_RESYNC:
+            if self.advance_steady():
+                return
+
+        if self.fast_forward:
+            state = self.read_body_state()
+            rect_x, square_x = state[RECT_X], state[SQUARE_X]
+
         self.rect_body.linearVelocity = (action, 0)
+        self.body_state_valid = False
 
         # apply the same action for 10 steps
         skip = 10
         for _ in range(skip):
             self.world.Step(self.TIME_STEP, 1, 1)
-            self.clock.tick(self.TARGET_FPS)
+            if self.realtime:
+                self.clock.tick(self.TARGET_FPS)
+
+        if self.fast_forward:
+            self.detect_steady(action, rect_x, square_x)
+
+    ###################################################################### fast-forward part ######################################################################
+    # With a constant action the tray velocity is reset to the same value every step and, once the
+    # object has caught up, the object moves with the tray: every step repeats the same motion
+    # shifted in x. When two real steps in a row with the same action have the same displacements
+    # and end velocities and the object does not slip on the tray, the next steps are advanced
+    # analytically by that displacement. Any change of the action, the walls or every FF_RESYNC
+    # steps go back to the real stepping, which checks the steady state again.
+
+    def clear_fast_forward(self):
+        self.ff_last = None                             # (action, dx tray, dx object, vx tray, vx object) of the last real step
+        self.ff_step = None                             # same for the steady state, None when not steady
+        self.ff_count = 0
+
+    def detect_steady(self, action, rect_x, square_x):
+        state = self.read_body_state()
+        last = (action,
+                state[RECT_X] - rect_x,
+                state[SQUARE_X] - square_x,
+                state[RECT_VX],
+                state[SQUARE_VX])
+
+        steady = (self.ff_last is not None and self.ff_last[0] == action
+                  and abs(last[1] - last[2]) < self.FF_TOLERANCE
+                  and all(abs(a - b) < self.FF_TOLERANCE for a, b in zip(last[1:], self.ff_last[1:])))
+
+        self.ff_last = last
+        self.ff_step = last if steady else None
+        self.ff_count = 0
+
+    def advance_steady(self):
+        _, rect_dx, square_dx, rect_vx, square_vx = self.ff_step
+        rect_pos = self.rect_body.position
+        square_pos = self.square_body.position
+
+        # the walls are only handled by the real stepping
+        if (rect_pos.x - self.rect_center[0] + 2*rect_dx <= 0
+                or rect_pos.x + self.rect_center[0] + 2*rect_dx >= self.SCREEN_WIDTH):
+            return False
+
+        self.rect_body.position = (rect_pos.x + rect_dx, rect_pos.y)
+        self.rect_body.linearVelocity = (rect_vx, 0)
+        self.square_body.position = (square_pos.x + square_dx, square_pos.y)
+        self.square_body.linearVelocity = (square_vx, 0)
+        self.body_state_valid = False
+        self.ff_count += 1
+        return True
+
+    #################################################################### end fast-forward part ####################################################################
+
+
+    def step(self, action):
+
+        # physics only, shared with the batched DeliveryVectorEnv
+        self.simulate(action)
 
         obs = self.get_observation()
         reward = self.get_reward()
         terminal = self.terminate_cond()
 
         return obs, reward, terminal, False, {}
-        
-    def flip_y(self, y):
-        return 600-y 
 
-    def draw(self):
-        rect_pos = self.rect_body.position
-        square_pos = self.square_body.position
-        rect_rot = self.rect_body.angle
-        square_rot = self.square_body.angle
+    # Same as step() without any new array: the float32 observation is written into obs_out, a (5,)
+    # array or row idx of a (n, 5) buffer (e.g. (num_envs, 5)), and into rewards_out[idx] /
+    # terminations_out[idx] when given. The bodies are read once and reward/termination come from
+    # the same values; with obs_noise the noisy positions are written straight into the buffer too.
+    def step_into(self, action, obs_out, idx=0, rewards_out=None, terminations_out=None):
+
+        self.simulate(action)
+
+        self.write_observation(obs_out if obs_out.ndim == 1 else obs_out[idx])
 
-        self.screen.fill((255, 255, 255)) 
-        pygame.draw.line(self.screen, self.WALL_COLOR, (0, self.SCREEN_HEIGHT), (self.SCREEN_WIDTH, self.SCREEN_HEIGHT), width = self.WALL_WIDTH)                         # Ground
-        pygame.draw.line(self.screen, self.WALL_COLOR, (0, 0), (self.SCREEN_WIDTH, 0), width = self.WALL_WIDTH)                                                 # Ceiling
-        pygame.draw.line(self.screen, self.WALL_COLOR, (0, 0), (0, self.SCREEN_WIDTH), width = self.WALL_WIDTH)                                                 # Left-Wall
-        pygame.draw.line(self.screen, self.WALL_COLOR, (self.SCREEN_WIDTH, 0), (self.SCREEN_WIDTH, self.SCREEN_HEIGHT), width = self.WALL_WIDTH)                          # Right-wall
+        state = self.read_body_state()
+        rect_x, square_x = state[RECT_X], state[SQUARE_X]
+        diff_x = rect_x - square_x
 
-        pygame.draw.rect(self.screen, 
-            self.RECT_COLOR, 
-            pygame.Rect((rect_pos.x-self.rect_center[0],
-                self.flip_y(rect_pos.y)-self.rect_center[1]), 
-                (self.rect_width, self.rect_height), round=rect_rot))
+        # same as get_reward and terminate_cond
+        failed = diff_x > 30
+        delivered = rect_x >= 699
+        reward = int(delivered) - int(failed)
+        terminal = int(failed or delivered)
 
+        if rewards_out is not None:
+            rewards_out[idx] = reward
+        if terminations_out is not None:
+            terminations_out[idx] = terminal
 
-        pygame.draw.rect(self.screen, 
-            self.SQUARE_COLOR, 
-            pygame.Rect((square_pos.x-self.square_center[0],
-                self.flip_y(square_pos.y)-self.square_center[1]), 
-                (self.square_width, self.square_height), round=square_rot))
+        return reward, terminal
 
-        pygame.display.flip()
-        pygame.display.update()
+    def render(self):
+        if self.render_mode == "human":
+            self.draw()
+
+    def draw(self):
+        if self.renderer is None:
+            from renderer import DeliveryRenderer
+            self.renderer = DeliveryRenderer(self)
+        self.renderer.draw()
 
     def close(self):
-        pygame.quit()
+        if self.renderer is not None:
+            self.renderer.close()
+            self.renderer = None
 
 
 if __name__ == "__main__":
@@ -0,0 +1,118 @@
+# Evaluation grid of the ICO/ISO learner: every (object mass, object friction) condition x N trials,
+# run headless (headless_runner.py) on a pool of processes.
+#
+# usage: python eval_grid.py [template] [trials] [output dir in data/] [workers] [monitor]
+#   e.g. python eval_grid.py mICO_template_with_noise 5 grid
+#        python eval_grid.py mISO_template_with_noise 5 grid 0 monitor
+#   (0 workers: one per core; monitor: stop the stalled trials early, see convergence.parse_settings)
+#
+# Each trial is written in the layout of the data/Eval-* experiments:
+#   data/<output>/Eval-3kg-1.0f/1-Eval-3kg_1.0f.csv  (+ .cols)
+# and every trial is one line of data/<output>/summary.csv. The trial logs are started from an empty
+# file, so a trial does not resume the weight of a previous grid. With monitor settings every trial
+# gets its own convergence.ConvergenceMonitor, built in the worker, and the Reason column of the
+# summary is the reason code of a trial it stopped (empty otherwise).
+#
+# The headless runs are deterministic, the trials of a condition only differ by the seed of the
+# position noise; use a _with_noise template to get different trials.
+
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import headless_runner
+import learner_sim
+from convergence import ConvergenceMonitor, parse_settings
+from learner_log import convert_csv
+
+
+# (object mass in kg, object friction) of the data/Eval-* experiments
+CONDITIONS = [(0.03, 0.5), (0.03, 1.0), (0.3, 0.5), (0.3, 1.0), (3.0, 0.5), (3.0, 1.0)]
+
+SUMMARY_HEADER = ["Condition", "Trial", "obj_mass", "obj_friction", "Outcome", "Reason", "Attempts", "Weight", "o_speed",
+                  "Ticks", "sim_time", "wall_time"]
+
+
+def mass_label(obj_mass):
+    # 0.03 -> 30g, 3.0 -> 3kg
+    if obj_mass >= 1:
+        return f"{obj_mass:g}kg"
+    return f"{obj_mass*1000:g}g"
+
+
+def condition_label(obj_mass, obj_friction):
+    return f"{mass_label(obj_mass)}-{obj_friction:.1f}f"
+
+
+def trial_filename(output, obj_mass, obj_friction, trial):
+    # path in data/, e.g. grid/Eval-3kg-1.0f/1-Eval-3kg_1.0f.csv
+    name = f"{trial}-Eval-{mass_label(obj_mass)}_{obj_friction:.1f}f.csv"
+    return os.path.join(output, "Eval-" + condition_label(obj_mass, obj_friction), name)
+
+
+def run_trial(template, obj_mass, obj_friction, trial, output, max_ticks, monitor=None):
+    # monitor: None, or the dict of ConvergenceMonitor settings ({} for the defaults)
+    filename = trial_filename(output, obj_mass, obj_friction, trial)
+    path = learner_sim.filepath(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    learner_sim.create(filename)                                                # empty log: no weight resumed
+    convert_csv(path)
+    convergence = ConvergenceMonitor(**monitor) if monitor is not None else None
+    result = headless_runner.run(template, obj_mass, obj_friction, output=filename, seed=trial, max_ticks=max_ticks,
+                                 monitor=convergence)
+    result["trial"] = trial
+    result["reason"] = convergence.reason if convergence is not None and convergence.reason else ""
+    return result
+
+
+def run_grid(template="mICO_template", trials=5, conditions=CONDITIONS, output="grid", workers=None, max_ticks=1000000,
+             monitor=None):
+    # runs every trial of every condition, writes data/<output>/summary.csv and returns the results
+    # in the order of conditions and trials. monitor: settings of the ConvergenceMonitor of every trial
+    tasks = [(template, obj_mass, obj_friction, trial, output, max_ticks, monitor)
+             for obj_mass, obj_friction in conditions for trial in range(1, trials+1)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_trial, *task): task for task in tasks}
+        for future in as_completed(futures):
+            _, obj_mass, obj_friction, trial, _, _, _ = futures[future]
+            results[(obj_mass, obj_friction, trial)] = future.result()
+    results = [results[(task[1], task[2], task[3])] for task in tasks]
+
+    summary_path = learner_sim.filepath(os.path.join(output, "summary.csv"))
+    with open(summary_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_HEADER)
+        for r in results:
+            writer.writerow([condition_label(r["obj_mass"], r["obj_friction"]), r["trial"], r["obj_mass"], r["obj_friction"],
+                             r["outcome"], r["reason"], r["attempts"], r["weight"], r["speed"], r["ticks"], r["sim_time"], r["wall_time"]])
+    return results
+
+
+if __name__ == "__main__":
+
+    template = sys.argv[1] if len(sys.argv) > 1 else "mICO_template"
+    trials = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    output = sys.argv[3] if len(sys.argv) > 3 else "grid"
+    workers = int(sys.argv[4]) or None if len(sys.argv) > 4 else None
+    monitor = parse_settings(sys.argv[5]) if len(sys.argv) > 5 else None
+
+    start = time.perf_counter()
+    results = run_grid(template, trials, output=output, workers=workers, monitor=monitor)
+    elapsed = time.perf_counter() - start
+
+    # one line per condition: outcomes and mean of the trials
+    print(f"{template}: {len(results)} runs in {elapsed:.1f} s, summary in data/{output}/summary.csv")
+    print(f"{'condition':>12} {'done':>5} {'attempts':>9} {'weight':>9} {'o_speed':>9}")
+    for obj_mass, obj_friction in CONDITIONS:
+        runs = [r for r in results if (r["obj_mass"], r["obj_friction"]) == (obj_mass, obj_friction)]
+        done = [r for r in runs if r["outcome"] == "done"]
+        attempts = sum(r["attempts"] for r in runs) / len(runs)
+        weight = sum(r["weight"] for r in runs) / len(runs)
+        speeds = [r["speed"] for r in done if r["speed"] is not None]
+        speed = f"{sum(speeds)/len(speeds):9.2f}" if speeds else f"{'-':>9}"
+        print(f"{condition_label(obj_mass, obj_friction):>12} {len(done):>2}/{len(runs):<2} {attempts:9.1f} {weight:9.6f} {speed}")
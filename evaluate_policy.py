@@ -0,0 +1,118 @@
+# Evaluation of a trained PPO agent, without any training.
+#
+# The agent is loaded from a checkpoint of the trainers (checkpoint.py, its observation normaliser
+# is used frozen) or from a .pth state_dict (runs/trained_models, no normaliser saved: the
+# observations are normalised with statistics updated on the way, as in training). It is run on a
+# DeliveryVectorEnv for num_episodes episodes with its mean action (no sampling) under
+# torch.inference_mode(), the envs each run their share of the episodes.
+# The report has the success rate (delivered), the return, the episode length and the speed of the
+# tray (10 x the mean action over the episode, the "average speed" of training) of all episodes and
+# of the successful ones.
+#
+# With the same physical parameters and frozen statistics, every episode of a deterministic policy
+# is the same: evaluate several conditions at once with per-env parameters (envs.set_params).
+#
+# usage: python evaluate_policy.py <checkpoint or .pth> [episodes] [num_envs] [obj_mass] [obj_friction]
+
+import os, sys, time
+
+import numpy as np
+import torch
+
+from checkpoint import load_checkpoint, obs_stats
+from continuous_ppo import Agent
+from vector_env import DeliveryVectorEnv
+
+
+def load_agent(path):
+    # (agent state_dict, normaliser (mean, var) or None)
+    checkpoint = load_checkpoint(path)
+    if "agent" in checkpoint and "global_step" in checkpoint:
+        return checkpoint["agent"], obs_stats(checkpoint)
+    return checkpoint, None
+
+
+def make_eval_envs(num_envs, stats, max_episode_steps=5000, **env_kwargs):
+    if stats is None:
+        print("No normaliser statistics saved with the model, they are updated during the evaluation")
+        return DeliveryVectorEnv(num_envs, normalize_obs=True, max_episode_steps=max_episode_steps, **env_kwargs)
+    return DeliveryVectorEnv(num_envs, obs_stats=stats, max_episode_steps=max_episode_steps, **env_kwargs)
+
+
+def evaluate(agent, envs, num_episodes, device="cpu"):
+    # runs num_episodes episodes, returns their (success, return, length, speed) arrays
+    num_envs = envs.num_envs
+    quota = np.full(num_envs, num_episodes // num_envs)
+    quota[:num_episodes % num_envs] += 1
+    finished = np.zeros(num_envs, dtype=np.int64)
+
+    returns = np.zeros(num_envs)
+    lengths = np.zeros(num_envs, dtype=np.int64)
+    speed_sums = np.zeros(num_envs)
+    episodes = {"success": [], "return": [], "length": [], "speed": []}
+
+    agent.eval()
+    next_obs, _ = envs.reset()
+    with torch.inference_mode():
+        while (finished < quota).any():
+            action = agent.actor_mean(torch.as_tensor(next_obs, device=device)).cpu().numpy()
+            next_obs, reward, terminated, truncated, _ = envs.step(action)
+
+            returns += reward
+            lengths += 1
+            speed_sums += 10.0 * action[:, 0]
+
+            ended = terminated | truncated
+            for i in np.flatnonzero(ended & (finished < quota)):
+                # +1 on the last step is a delivery (a failed one is -1, a truncated one 0)
+                episodes["success"].append(reward[i] > 0)
+                episodes["return"].append(returns[i])
+                episodes["length"].append(lengths[i])
+                episodes["speed"].append(speed_sums[i] / lengths[i])
+            finished += ended
+            returns[ended] = 0
+            lengths[ended] = 0
+            speed_sums[ended] = 0
+
+    return {name: np.array(values) for name, values in episodes.items()}
+
+
+def summary(episodes):
+    success = episodes["success"]
+    report = {"episodes": len(success), "success_rate": success.mean()}
+    for name in ("return", "length", "speed"):
+        for label, mask in (("", slice(None)), ("success_", success)):
+            values = episodes[name][mask]
+            if len(values):
+                report[f"{label}{name}"] = (values.mean(), values.std(), values.min(), values.max())
+    return report
+
+
+if __name__ == "__main__":
+
+    path = sys.argv[1]
+    num_episodes = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    num_envs = int(sys.argv[3]) if len(sys.argv) > 3 else min(num_episodes, 24)
+    obj_mass = float(sys.argv[4]) if len(sys.argv) > 4 else 0.3
+    obj_friction = float(sys.argv[5]) if len(sys.argv) > 5 else 1.0
+
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+    state_dict, stats = load_agent(path)
+    envs = make_eval_envs(num_envs, stats, obj_mass=obj_mass, obj_friction=obj_friction)
+    agent = Agent(envs).to(device)
+    agent.load_state_dict(state_dict)
+
+    start = time.perf_counter()
+    episodes = evaluate(agent, envs, num_episodes, device)
+    elapsed = time.perf_counter() - start
+    envs.close()
+
+    report = summary(episodes)
+    print(f"{os.path.basename(path)}: {report['episodes']} episodes on {num_envs} envs in {elapsed:.2f} s, "
+          f"obj_mass={obj_mass} obj_friction={obj_friction}")
+    print(f"success rate: {report['success_rate']:.3f}")
+    print(f"{'':>16} {'mean':>9} {'std':>9} {'min':>9} {'max':>9}")
+    for name in ("return", "length", "speed", "success_return", "success_length", "success_speed"):
+        if name in report:
+            print(f"{name:>16} " + " ".join(f"{value:9.3f}" for value in report[name]))
@@ -0,0 +1,128 @@
+# Export of a trained PPO agent for the control loop.
+#
+# At deployment only the mean action is needed: export_policy keeps the actor_mean network of the
+# agent and folds into it
+#   - the observation normaliser of the checkpoint (frozen, see checkpoint.obs_stats) into the
+#     first layer: W (x - mean) / std + b = (W / std) x + (b - W mean / std)
+#   - the x10 action rescale of DeliveryEnv.simulate into the last layer
+# so the exported policy takes the raw observation of DeliveryEnv.get_observation
+# (rect_x, rect_vx, square_x, square_vx, rect_x - square_x) and returns the tray velocity to set
+# (rect_body.linearVelocity = (velocity, 0)), the same as the agent in the normalised env up to
+# float rounding.
+#
+# Two formats, chosen by the extension of the output file:
+#   .npz : the weights for NumpyPolicy (NumPy only, no torch at run time)
+#   .pt  : a TorchScript module, torch.jit.load(path)(obs) without the code of the agent
+# Latency of a single observation against the agent: python benchmarks/bench_policy_latency.py
+#
+# usage: python export_policy.py <checkpoint> <output .npz or .pt>
+
+import sys
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from evaluate_policy import load_agent
+
+ACTION_SCALE = 10.0                                     # action -> tray velocity, see DeliveryEnv.simulate
+
+
+def fold_policy(state_dict, stats, epsilon=1e-8, action_scale=ACTION_SCALE):
+    # [(weight (in, out), bias), ...] of actor_mean in float64 with the normaliser and the rescale folded in
+    layers = []
+    index = 0
+    while f"actor_mean.{index}.weight" in state_dict:
+        weight = state_dict[f"actor_mean.{index}.weight"].double().cpu().numpy().T
+        bias = state_dict[f"actor_mean.{index}.bias"].double().cpu().numpy()
+        layers.append((weight, bias))
+        index += 2                                      # Linear, Tanh, Linear, ...
+    if not layers:
+        raise ValueError("No actor_mean layers in the state_dict")
+
+    mean, var = stats
+    std = np.sqrt(np.asarray(var, dtype=np.float64) + epsilon)
+    weight, bias = layers[0]
+    layers[0] = (weight / std[:, None], bias - (np.asarray(mean, dtype=np.float64) / std) @ weight)
+    weight, bias = layers[-1]
+    layers[-1] = (weight * action_scale, bias * action_scale)
+    return layers
+
+
+class NumpyPolicy:
+    # exported policy on NumPy: policy(obs) -> tray velocity, obs is one observation (5,) or a batch (n, 5)
+
+    def __init__(self, layers):
+        self.layers = [(np.ascontiguousarray(weight), bias) for weight, bias in layers]
+        # single observation (act): hidden activations in preallocated buffers, last layer as a dot product
+        self.hidden = [(weight, bias, np.empty(bias.shape)) for weight, bias in self.layers[:-1]]
+        weight, bias = self.layers[-1]
+        self.out_weight, self.out_bias = np.ascontiguousarray(weight[:, 0]), float(bias[0])
+
+    @classmethod
+    def load(cls, path):
+        weights = np.load(path)
+        return cls([(weights[f"weight_{i}"], weights[f"bias_{i}"]) for i in range(len(weights.files) // 2)])
+
+    def save(self, path):
+        np.savez(path, **{f"{name}_{i}": value for i, layer in enumerate(self.layers)
+                          for name, value in zip(("weight", "bias"), layer)})
+
+    def act(self, obs):
+        # one observation, no array created on the way
+        x = obs if type(obs) is np.ndarray and obs.dtype == np.float64 else np.asarray(obs, dtype=np.float64)
+        for weight, bias, out in self.hidden:
+            np.dot(x, weight, out=out)
+            np.add(out, bias, out=out)
+            np.tanh(out, out=out)
+            x = out
+        return float(np.dot(x, self.out_weight)) + self.out_bias
+
+    def __call__(self, obs):
+        x = np.asarray(obs, dtype=np.float64)
+        if x.ndim == 1:
+            return self.act(x)
+        last = len(self.layers) - 1
+        for i, (weight, bias) in enumerate(self.layers):
+            x = x @ weight + bias
+            if i < last:
+                np.tanh(x, out=x)
+        # one velocity per observation
+        return x[:, 0]
+
+
+def torch_policy(layers):
+    # the same network as an nn.Sequential (float32), ready for torch.jit.script
+    modules = []
+    for i, (weight, bias) in enumerate(layers):
+        linear = nn.Linear(*weight.shape)
+        with torch.no_grad():
+            linear.weight.copy_(torch.from_numpy(weight.T))
+            linear.bias.copy_(torch.from_numpy(bias))
+        modules.append(linear)
+        if i < len(layers) - 1:
+            modules.append(nn.Tanh())
+    return nn.Sequential(*modules).eval()
+
+
+def export_policy(state_dict, stats, path):
+    if stats is None:
+        raise ValueError("The agent has no observation-normaliser statistics, export it from a trainer checkpoint")
+    layers = fold_policy(state_dict, stats)
+    if path.endswith(".npz"):
+        NumpyPolicy(layers).save(path)
+    elif path.endswith(".pt"):
+        torch.jit.script(torch_policy(layers)).save(path)
+    else:
+        raise ValueError(f"Unknown policy format `{path}`, expected a .npz or .pt file")
+    return layers
+
+
+if __name__ == "__main__":
+
+    path = sys.argv[1]
+    output = sys.argv[2] if len(sys.argv) > 2 else "policy.npz"
+
+    state_dict, stats = load_agent(path)
+    export_policy(state_dict, stats, output)
+    print(f"Policy of {path} exported to {output}")
@@ -0,0 +1,45 @@
+# Headless, faster-than-real-time runner of the ICO/ISO learner templates.
+#
+# usage: python headless_runner.py [template] [obj_mass] [obj_friction] [output.csv] [monitor]
+#   e.g. python headless_runner.py mICO_template 3.0 1.0 Headless-3kg_1.0f.csv
+#        python headless_runner.py mISO_template_with_noise 0.03 1.0 - window=5,attempt_ticks=5000
+#   ("-" for no output; monitor: stop a stalled run early, see convergence.parse_settings)
+#
+# The world and the learning loop are the same as the templates (learner.py, learner_sim.py) but
+# without window, drawing or clock: the time of the learner is the simulated time of the fixed
+# world.Step(1/60) instead of pygame.time.get_ticks(), so a full run takes seconds and gives the
+# same result on every machine. The noise of the _with_noise templates is a seeded noise.UniformNoise.
+#
+# The output file (optional, in data/) has the same columns as the template logs.
+
+import sys
+
+from learner import Learner, TEMPLATES
+from noise import UniformNoise
+import learner_sim
+from convergence import ConvergenceMonitor, parse_settings
+
+
+def run(template="mICO_template", obj_mass=0.03, obj_friction=1.0, output=None, seed=0, max_ticks=1000000, monitor=None, **world_kwargs):
+    # returns a summary dict of the run; rows are written to data/<output> when output is given.
+    # With a monitor (convergence.ConvergenceMonitor), a stalled run is stopped early (see learner_sim.run)
+    rule, noise, _ = TEMPLATES[template]
+    learner = Learner(rule, noise=UniformNoise(0, noise, seed=seed) if noise else 0)
+    result = learner_sim.run(learner, output, obj_mass=obj_mass, obj_friction=obj_friction, max_ticks=max_ticks, monitor=monitor,
+                             **world_kwargs)
+    result["template"] = template
+    return result
+
+
+if __name__ == "__main__":
+
+    template = sys.argv[1] if len(sys.argv) > 1 else "mICO_template"
+    obj_mass = float(sys.argv[2]) if len(sys.argv) > 2 else 0.03
+    obj_friction = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    output = sys.argv[4] if len(sys.argv) > 4 and sys.argv[4] != "-" else None
+    monitor = ConvergenceMonitor(**parse_settings(sys.argv[5])) if len(sys.argv) > 5 else None
+
+    result = run(template, obj_mass, obj_friction, output, monitor=monitor)
+    print(f"{result['template']} ({result['obj_mass']} kg, friction {result['obj_friction']}): {result['outcome']} after "
+          f"{result['attempts']} attempts, weight {result['weight']:.6f}, {result['ticks']} ticks = "
+          f"{result['sim_time']:.1f} s simulated in {result['wall_time']:.2f} s")
@@ -0,0 +1,212 @@
+# Learner engine of the ICO/ISO templates.
+#
+# The six templates (ICO, mICO, ISO, mISO and the _with_noise variants) share the same 1-dim learner
+# and only differ by a few settings, which are the configuration of Learner:
+#   cp      : constant factor of the predictive signal (0.01 for the modified rules, 1 otherwise)
+#   so_term : the object signal so*wa is part of the neural output (modified rules)
+#   driver  : the weight is driven by the change of the reflexive signal (ICO, sr) or by the
+#             change of the neural output (ISO, o_neural)
+#   noise   : position noise of the object, uniform integer in [0, noise) px (0 = no noise), or a
+#             seeded noise.NoiseStream (uniform, Gaussian, dropout, ...) applied to the object position
+#
+# The engine has no pygame/Box2D part; learner_sim.py runs it in the tray world.
+
+import numpy as np
+
+from noise import NoiseStream, NoiseChain
+
+
+# Settings of each learning rule
+RULES = {
+    "ICO":  {"cp": 1,    "so_term": False, "driver": "sr"},
+    "mICO": {"cp": 0.01, "so_term": True,  "driver": "sr"},
+    "ISO":  {"cp": 1,    "so_term": False, "driver": "o_neural"},
+    "mISO": {"cp": 0.01, "so_term": True,  "driver": "o_neural"},
+}
+
+# The templates: data/<name>.csv log, rule, noise and window caption
+TEMPLATES = {
+    "ICO_template":                ("ICO",  0, "ICO simulation"),
+    "mICO_template":               ("mICO", 0, "modified ICO simulation"),
+    "ISO_template":                ("ISO",  0, "ISO simulation"),
+    "mISO_template":               ("mISO", 0, "modified ISO simulation"),
+    "mICO_template_with_noise":    ("mICO", 5, "modified ICO simulation"),
+    "mISO_template_with_noise":    ("mISO", 5, "modified ISO simulation"),
+}
+
+
+class Learner:
+
+    def __init__(self, rule="mICO", co=1, cp=None, wr=1, l_rate=0.01, et=10, pt=30, rt=70, max_speed=1500,
+                 noise=0, rng=None, wa=0.0):
+        settings = RULES[rule]
+        self.rule = rule
+        self.so_term = settings["so_term"]
+        self.driver = settings["driver"]
+
+        # Constant factor
+        self.co = co
+        self.cp = settings["cp"] if cp is None else cp
+        self.wr = wr
+
+        # This learning rate has to be adjusted in case that the weight reaches 1 too fast.
+        self.l_rate = l_rate
+
+        # Range threshold between current position (object) and reference position (center of the tray)
+        self.et = et                                    # Exemption threshold; allows the object to move without triggering learning mechanism
+        self.pt = pt                                    # Predictive threshold; prior signal for the robot to 'soft-adapt' itself (reduce speed without any learning)
+        self.rt = rt                                    # Reflexive threshold; later signal used to trigger learning mechanism
+
+        # This is the maximum speed available in the simulation (pixel/s)
+        self.max_speed = max_speed
+
+        # Position noise of the object: an int is drawn from rng per tick (np.random when rng is None),
+        # a NoiseStream is applied to the object position
+        self.noise = noise
+        self.rng = rng
+
+        # Learner state
+        self.wa = wa                                    # adaptive weight
+        self.t_prev = 0
+        self.prev = 0                                   # previous driver signal (sr or o_neural)
+        self.attempt = 1
+        self.redo = 0
+        self.failed = False
+        self.row = None                                 # values of the last learning tick, see tick()
+
+    ################################################################################ learning part ################################################################################
+
+    def signal_generator(self, xc, xr):
+        diff_x = abs(xc-xr)
+        et, pt, rt = self.et, self.pt, self.rt
+
+        # Conditions for each threshold (with the normalization)
+        if diff_x >= 0 and diff_x < et:
+            so = 1.0
+            sp = 0.0
+            sr = 0.0
+
+        elif diff_x >= et and diff_x < pt:
+            so = 1.0
+            sp = round((diff_x-et)/(pt-et)+0.005, 2)
+            sr = 0.0
+
+        elif diff_x >= pt and diff_x < rt:
+            so = 1.0
+            sp = 1.0
+            sr = round((diff_x-pt)/(rt-pt)+0.005,2)
+
+        else:
+            so = 0.0
+            sp = 1.0
+            sr = 1.0
+
+        return so, sp, sr
+
+    def o_learning(self, so, sp, sr, t):
+        wa = self.wa
+
+        # Neural nodes
+        so_term = self.co*so*wa
+        sp_term = self.cp*sp*wa
+        sr_term = sr*self.wr
+
+        if self.so_term:
+            o_neural = so_term+sp_term+sr_term
+        else:
+            o_neural = sp_term+sr_term
+
+        # ICO: the weight follows the rising reflexive signal scaled by sp, ISO: the rising output scaled by itself
+        if self.driver == "sr":
+            new_wa, delta = self.update_weight(sr, sp, t)
+            self.prev = sr
+        else:
+            new_wa, delta = self.update_weight(o_neural, o_neural, t)
+            self.prev = o_neural
+
+        self.wa = new_wa
+        self.t_prev = t
+        return o_neural, new_wa, delta
+
+    def update_weight(self, signal, factor, t):
+        signal_prev = self.prev
+
+        # delta terms
+        signal_delta = signal-signal_prev
+        t_delta = t-self.t_prev
+
+        # This condition is used to cover on the first tick of learning
+        if t_delta == 0:
+            delta = 0
+
+        else:
+            # This condition is a constraint for learning where we use the rising signal only.
+            if signal >= signal_prev:
+                delta = signal_delta/t_delta
+
+            else:
+                delta = 0.0
+
+        # Weight update methods
+        wa_delta = self.l_rate * factor * delta
+        new_wa = wa_delta+self.wa
+
+        return new_wa, delta
+
+    def o_speed(self, o_neural):
+        return self.max_speed - (self.max_speed * o_neural)
+
+    def position_noise(self):
+        if self.noise == 0:
+            return 0
+        if self.rng is None:
+            return np.random.randint(0, self.noise)
+        return int(self.rng.integers(0, self.noise))
+
+    ############################################################################## end learning part ##############################################################################
+
+    # One tick of the template loop from the object (xc) and tray (xr) positions at time t.
+    # Returns (speed, reset): the new tray speed (None when the learner does not set it) and whether
+    # the tray/object have to be put back to the start afterwards. After a learning tick self.row
+    # holds the log row (Timestamp, Attempt, Weight, Predictive, Reflexive, Derivative, o_neural, o_speed).
+    def tick(self, xc, xr, t):
+        self.row = None
+        if isinstance(self.noise, (NoiseStream, NoiseChain)):
+            xc = self.noise.apply(xc)
+        else:
+            xc = xc + self.position_noise()
+        so, sp, sr = self.signal_generator(xc, xr)
+
+        # In case of adaptive weight is more than 1, the learning is automatically failed due to the weight updated too fast. Try to tune the learning weight.
+        if self.wa > 1:
+            self.failed = True
+            return None, False
+
+        # When the object is out of the learning area. Reset position, previous signal and increase attempt
+        if so == 0 or sr == 1:
+            self.prev = 0.0
+            self.attempt += 1
+            return None, True
+
+        o_neural, new_w, d = self.o_learning(so, sp, sr, t)
+        speed = self.o_speed(o_neural)
+        self.row = [t, self.attempt, new_w, sp, sr, d, o_neural, speed]
+
+        # If the speed is lower than the threshold without reaching the goal, it has to be stopped and move on to the next attempt
+        reset = False
+        if speed < 1:
+            speed = 0
+            reset = True
+            self.attempt += 1
+
+        # This condition is used to execute one more attempt to confirm the weight.
+        if xr >= 699:
+            reset = True
+            self.prev = 0.0
+            self.redo += 1
+            self.attempt += 1
+
+        return speed, reset
+
+    def done(self):
+        return self.failed or self.redo >= 2
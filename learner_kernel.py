@@ -0,0 +1,187 @@
+# Compiled learner tick of the ICO/ISO templates.
+#
+# tick() is one Learner.tick (signal_generator, o_learning, update_weight, o_speed and the
+# reset/attempt logic) as a single function on flat float64 arrays, compiled with Numba when it is
+# installed (pip install numba) and plain Python otherwise. The result is bit for bit the one of
+# Learner, also the round(..., 2) of the signals (round2 below).
+#   params : PARAMS values of a learner (constants and rule settings), see params_of()
+#   state  : STATE values (weight, previous signal, attempt, ...), see state_of() / store_state()
+#   row    : the log row of a learning tick is written here (same columns as learner_log.HEADER)
+# run_ticks() runs one learner over arrays of positions/times (e.g. replay of a recorded run) and
+# tick_population() one tick of many learners (rows of params/state).
+#
+# The position noise of the _with_noise templates is not part of the kernel: add it to xc first.
+#
+# Benchmark against Learner: python benchmarks/bench_learner_kernel.py
+
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    def njit(*args, **kwargs):
+        # no Numba: the functions stay plain Python
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda function: function
+
+
+# Indices of the params and state arrays
+CO, CP, WR, L_RATE, ET, PT, RT, MAX_SPEED, SO_TERM, ISO = range(10)
+PARAMS_SIZE = 10
+WA, T_PREV, PREV, ATTEMPT, REDO, FAILED = range(6)
+STATE_SIZE = 6
+ROW_SIZE = 8
+
+
+def params_of(learner):
+    params = np.empty(PARAMS_SIZE)
+    params[CO], params[CP], params[WR] = learner.co, learner.cp, learner.wr
+    params[L_RATE] = learner.l_rate
+    params[ET], params[PT], params[RT] = learner.et, learner.pt, learner.rt
+    params[MAX_SPEED] = learner.max_speed
+    params[SO_TERM] = learner.so_term
+    params[ISO] = learner.driver == "o_neural"
+    return params
+
+
+def state_of(learner):
+    state = np.empty(STATE_SIZE)
+    state[WA], state[T_PREV], state[PREV] = learner.wa, learner.t_prev, learner.prev
+    state[ATTEMPT], state[REDO], state[FAILED] = learner.attempt, learner.redo, learner.failed
+    return state
+
+
+def store_state(learner, state):
+    # writes the kernel state back to the Learner
+    learner.wa, learner.t_prev, learner.prev = float(state[WA]), float(state[T_PREV]), float(state[PREV])
+    learner.attempt, learner.redo, learner.failed = int(state[ATTEMPT]), int(state[REDO]), bool(state[FAILED])
+
+
+@njit(cache=True)
+def round2(x):
+    # round(x, 2) of Python for a float or an array (also used by vector_learner), |x| < 2**44: the
+    # exact x*100 (Dekker product) is rounded half to even, so the result is the same double as round()
+    # also when x*100 is not exact. Only operators, the same code runs on floats, arrays and in Numba.
+    p = x * 100
+    split = x * 134217729.0                                                     # 2**27 + 1
+    x_hi = split - (split - x)
+    x_lo = x - x_hi
+    error = (x_hi * 100 - p) + x_lo * 100                                       # x*100 = p + error exactly
+    k = (p + 6755399441055744.0) - 6755399441055744.0                          # rint (1.5 * 2**52), half to even
+    half = p - k
+    tie = (half == 0.5) | (half == -0.5)                                        # p is a half: up or down with the sign of error
+    k = k + tie * ((error > 0) * (p + 0.5 - k) + (error < 0) * (p - 0.5 - k))
+    return k / 100
+
+
+@njit(cache=True)
+def signal_generator(params, xc, xr):
+    diff_x = abs(xc-xr)
+    et, pt, rt = params[ET], params[PT], params[RT]
+
+    if diff_x >= 0 and diff_x < et:
+        return 1.0, 0.0, 0.0
+    elif diff_x >= et and diff_x < pt:
+        return 1.0, round2((diff_x-et)/(pt-et)+0.005), 0.0
+    elif diff_x >= pt and diff_x < rt:
+        return 1.0, 1.0, round2((diff_x-pt)/(rt-pt)+0.005)
+    return 0.0, 1.0, 1.0
+
+
+@njit(cache=True)
+def done(state):
+    return state[FAILED] != 0 or state[REDO] >= 2
+
+
+# One Learner.tick. Returns (speed, reset), speed is nan when Learner.tick returns None.
+# row is only written on a learning tick (when Learner.row is set).
+@njit(cache=True)
+def tick(params, state, xc, xr, t, row):
+    so, sp, sr = signal_generator(params, xc, xr)
+
+    # weight over 1: failed
+    if state[WA] > 1:
+        state[FAILED] = 1.0
+        return np.nan, False
+
+    # object out of the learning area
+    if so == 0 or sr == 1:
+        state[PREV] = 0.0
+        state[ATTEMPT] += 1
+        return np.nan, True
+
+    # neural output
+    wa = state[WA]
+    so_term = params[CO]*so*wa
+    sp_term = params[CP]*sp*wa
+    sr_term = sr*params[WR]
+    if params[SO_TERM] != 0:
+        o_neural = so_term+sp_term+sr_term
+    else:
+        o_neural = sp_term+sr_term
+
+    # weight update on the rising driver signal, sr (ICO) or o_neural (ISO)
+    if params[ISO] != 0:
+        signal, factor = o_neural, o_neural
+    else:
+        signal, factor = sr, sp
+    signal_delta = signal-state[PREV]
+    t_delta = t-state[T_PREV]
+    if t_delta == 0:
+        delta = 0.0
+    elif signal >= state[PREV]:
+        delta = signal_delta/t_delta
+    else:
+        delta = 0.0
+    new_wa = params[L_RATE] * factor * delta + wa
+    state[WA] = new_wa
+    state[PREV] = signal
+    state[T_PREV] = t
+
+    # output speed
+    speed = params[MAX_SPEED] - (params[MAX_SPEED] * o_neural)
+    row[0], row[1], row[2], row[3] = t, state[ATTEMPT], new_wa, sp
+    row[4], row[5], row[6], row[7] = sr, delta, o_neural, speed
+
+    reset = False
+    if speed < 1:
+        speed = 0.0
+        reset = True
+        state[ATTEMPT] += 1
+
+    # delivered: one more attempt to confirm the weight
+    if xr >= 699:
+        reset = True
+        state[PREV] = 0.0
+        state[REDO] += 1
+        state[ATTEMPT] += 1
+
+    return speed, reset
+
+
+# Ticks of one learner over the positions xc[i], xr[i] at the times t[i] until it is done.
+# Fills speeds/resets (and rows, nan for the ticks without learning) and returns the number of ticks run.
+@njit(cache=True)
+def run_ticks(params, state, xc, xr, t, speeds, resets, rows):
+    for i in range(len(xc)):
+        if done(state):
+            return i
+        rows[i, :] = np.nan
+        speeds[i], resets[i] = tick(params, state, xc[i], xr[i], t[i], rows[i])
+    return len(xc)
+
+
+# One tick of many learners (params[i], state[i]) at the same time t; the learners that are
+# already done are skipped (speed nan, no reset).
+@njit(cache=True)
+def tick_population(params, state, xc, xr, t, speeds, resets, rows):
+    for i in range(len(xc)):
+        if done(state[i]):
+            speeds[i], resets[i] = np.nan, False
+            continue
+        rows[i, :] = np.nan
+        speeds[i], resets[i] = tick(params[i], state[i], xc[i], xr[i], t, rows[i])
@@ -0,0 +1,213 @@
+# Log writer of the ICO/ISO learner templates.
+#
+# The templates log one row per tick. Instead of opening the CSV file for every row, the rows are
+# kept in memory and appended to the file in batches by a background thread (every flush_rows rows
+# or every flush_interval seconds). close() writes what is left; it is called by the templates on
+# pygame.QUIT, on ESC and at the end of the run, and at interpreter exit as a safety net.
+# The file and the columns are the same as before, see HEADER.
+#
+# With columns=True the same rows are also stored in a columnar binary format next to the CSV
+# (e.g. data/mICO_template.cols/ for data/mICO_template.csv): one raw little-endian file per
+# column (COLUMN_DTYPES) that load_columns() memory-maps without any parsing. Existing CSV logs
+# can be converted once with:
+#
+#   python learner_log.py data/
+
+import atexit
+import csv
+import os
+import sys
+import threading
+
+import numpy as np
+
+
+HEADER = ["Timestamp", "Attempt", "Weight", "Predictive", "Reflexive", "Derivative", "o_neural", "o_speed"]
+COLUMN_DTYPES = {name: np.dtype("<i8") if name == "Attempt" else np.dtype("<f8") for name in HEADER}
+
+
+class BufferedLogger:
+
+    def __init__(self, path, flush_rows=1000, flush_interval=1.0, columns=False):
+        self.path = path
+
+        # the columnar copy starts with the rows already in the CSV (resumed runs); it is rebuilt when
+        # it does not have the same rows (missing, or the CSV was written without columns=True since)
+        self.columns_path = None
+        if columns:
+            self.columns_path = columns_dir(path)
+            csv_rows = count_rows(path) if os.path.exists(path) else 0
+            if columns_rows(self.columns_path) != csv_rows:
+                convert_csv(path)
+
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self.rows = []
+        self.rows_lock = threading.Lock()               # protects self.rows
+        self.file_lock = threading.Lock()               # keeps the batches in order in the file
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.error = None
+        self.saved = 0
+
+        self.thread = threading.Thread(target=self.run, name="BufferedLogger", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, row):
+        # errors of the background thread are raised in the caller
+        if self.error is not None:
+            raise self.error
+        if self.closed:
+            raise ValueError(f"write to a closed log: {self.path}")
+        with self.rows_lock:
+            self.rows.append(row)
+            full = len(self.rows) >= self.flush_rows
+        if full:
+            self.wakeup.set()
+
+    def run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as error:
+                self.error = error
+                print("[ERROR]: Cannot save: ", self.path)
+                return
+
+    def flush(self):
+        with self.file_lock:
+            with self.rows_lock:
+                rows, self.rows = self.rows, []
+            if rows:
+                with open(self.path, 'a', newline='') as open_dat:
+                    csv.writer(open_dat).writerows(rows)
+                if self.columns_path is not None:
+                    append_columns(self.columns_path, rows)
+                self.saved += len(rows)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join()
+        atexit.unregister(self.close)
+        if self.error is None:
+            self.flush()
+            print(f"[INFO]: {self.saved} rows have been saved to {self.path}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+############################################################################## columnar format ##############################################################################
+
+def columns_dir(csv_path):
+    return os.path.splitext(csv_path)[0] + ".cols"
+
+
+def append_columns(path, rows):
+    # rows are lists in the HEADER order
+    os.makedirs(path, exist_ok=True)
+    for name, values in zip(HEADER, zip(*rows)):
+        with open(os.path.join(path, name), 'ab') as f:
+            np.asarray(values, dtype=COLUMN_DTYPES[name]).tofile(f)
+
+
+def load_columns(path):
+    # {column name: read-only array} of a .cols directory (or of the .cols next to a .csv path);
+    # the arrays are memory-mapped, nothing is read before it is used
+    if path.endswith(".csv"):
+        path = columns_dir(path)
+    columns = {}
+    for name in HEADER:
+        column_path = os.path.join(path, name)
+        if os.path.getsize(column_path) == 0:
+            columns[name] = np.empty(0, dtype=COLUMN_DTYPES[name])
+        else:
+            columns[name] = np.memmap(column_path, dtype=COLUMN_DTYPES[name], mode='r')
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) != 1:
+        raise ValueError(f"columns of {path} have different lengths: {sorted(lengths)}")
+    return columns
+
+
+def columns_rows(path):
+    # number of rows of a .cols directory, None when a column is missing or the lengths differ
+    lengths = set()
+    for name in HEADER:
+        column_path = os.path.join(path, name)
+        if not os.path.isfile(column_path):
+            return None
+        size, itemsize = os.path.getsize(column_path), COLUMN_DTYPES[name].itemsize
+        if size % itemsize:
+            return None
+        lengths.add(size // itemsize)
+    return lengths.pop() if len(lengths) == 1 else None
+
+
+def load_tree(root):
+    # {.cols path relative to root: columns} of every converted log under root, e.g. load_tree("data")
+    runs = {}
+    for directory, subdirs, _ in os.walk(root):
+        for subdir in sorted(subdirs):
+            if subdir.endswith(".cols"):
+                path = os.path.join(directory, subdir)
+                runs[os.path.relpath(path, root)] = load_columns(path)
+        subdirs[:] = sorted(d for d in subdirs if not d.endswith(".cols"))
+    return runs
+
+
+def read_csv(csv_path):
+    # rows of a learner CSV (header and blank lines skipped)
+    rows = []
+    with open(csv_path, newline='') as f:
+        for line in csv.reader(f):
+            if not line or not line[0].strip() or line[0] == HEADER[0]:
+                continue
+            row = [float(value) for value in line]
+            row[1] = int(row[1])
+            rows.append(row)
+    return rows
+
+
+def count_rows(csv_path):
+    # number of rows read_csv gives, without parsing them
+    count = 0
+    with open(csv_path, 'rb') as f:
+        for line in f:
+            first = line.split(b',', 1)[0].strip()
+            if first and first != HEADER[0].encode():
+                count += 1
+    return count
+
+
+def convert_csv(csv_path):
+    # writes (or rewrites) the .cols directory of one CSV log, returns the number of rows
+    path = columns_dir(csv_path)
+    os.makedirs(path, exist_ok=True)
+    for name in HEADER:
+        open(os.path.join(path, name), 'wb').close()
+    rows = read_csv(csv_path) if os.path.exists(csv_path) else []
+    if rows:
+        append_columns(path, rows)
+    return len(rows)
+
+
+if __name__ == "__main__":
+
+    # one-shot conversion of every CSV log under the given directories (default: data/)
+    roots = sys.argv[1:] or [os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")]
+    for root in roots:
+        for directory, _, files in sorted(os.walk(root)):
+            for name in sorted(files):
+                if name.endswith(".csv"):
+                    csv_path = os.path.join(directory, name)
+                    print(f"[INFO]: {csv_path}: {convert_csv(csv_path)} rows")
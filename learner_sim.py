@@ -0,0 +1,320 @@
+# Important note: pygame and box2d has different starting axis
+# pygame: (0,0) at the top-left (y-down)
+# Box2D: (0,0) at the bottom-left (y-up)
+#
+# Tray world and main loop of the ICO/ISO templates, shared by all of them (see learner.py for the
+# learning part). run() either opens the window (display=True, the templates) or runs headless and
+# faster than real time on the simulated time of the 1/60 s physics step (headless_runner.py).
+
+import os
+import sys
+import time
+
+import Box2D
+
+from learner_log import BufferedLogger, HEADER
+
+
+TIME_STEP = 1/60                                                                                                                                # Box2D step of the templates (60 fps)
+
+
+#################################################################################### World Initialization ####################################################################################
+
+def make_world(obj_mass=0.03, obj_friction=1.0, rect_mass=10, rect_friction=1.0, gravity=9.81):
+    SCREEN_WIDTH, SCREEN_HEIGHT = 800, 600                                                                                                      # Define the size of the screen
+
+    # Box2D Initialization
+    world = Box2D.b2World(gravity=(0, -gravity))                                                                                                # Define the Box2D world with gravity
+    PPM = 200                                                                                                                                   # Pixel per meter; meaning that this simulation is 4m distance with 3m height
+
+    # Wall Initialization
+    WALL_WIDTH = 1                                                                                                                              # 1-Pixel
+
+    # Box2DWall located at each edge of the screen (y-up)
+    ceiling_body = world.CreateStaticBody(position=(0, SCREEN_HEIGHT), shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (SCREEN_WIDTH, 0)]))
+    left_wall_body = world.CreateStaticBody(position=(0, 0), shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (0, SCREEN_HEIGHT)]))
+    right_wall_body = world.CreateStaticBody(position=(SCREEN_WIDTH, 0), shapes=Box2D.b2EdgeShape(vertices=[(0, 0), (0, SCREEN_HEIGHT)]))
+    ground_body = world.CreateStaticBody(position=(0, WALL_WIDTH))
+    ground_shape = Box2D.b2EdgeShape(vertices=[(0, 0), (SCREEN_WIDTH, 0)])
+    ground_fixture = ground_body.CreateFixture(shape=ground_shape, density=1.0, friction=1.0)
+
+    # Rectangle Initialization
+    rect_width = 1 * PPM                                                                                                                        # 200 pxl; 1m
+    rect_height = 0.25 * PPM                                                                                                                    # 50 pxl; 0.25m
+    rect_center = (rect_width/2, rect_height/2)                                                                                                 # Object center-point
+    rect_position = (rect_center[0], rect_center[1])                                                                                            # location to place rectangle
+
+    # Tray mass and friction; This is fixed to 10kg (if tray mass is less than the obj mass, it will partly submerged the tray into the ground)
+    rect_density = rect_mass * 1 * 0.25                                                                                                         # area; sq.meter unit
+
+    # Box2Drect located at the left-bottom of the screen (y-up)
+    rect_body = world.CreateDynamicBody(position= (rect_position), angle =0.0)
+    rect_shape = Box2D.b2PolygonShape(box= rect_center)
+    rect_fixture = rect_body.CreateFixture(shape=rect_shape, density=rect_density, friction=rect_friction)                                     # 10kg tray; mass(kg) = density*area(cm^2)
+
+    # Square Initialization
+    square_width = 0.25 * PPM                                                                                                                   # 50 pxl
+    square_height = 0.25 * PPM                                                                                                                  # 50 pxl
+    square_center = (square_width/2, square_height/2)                                                                                           # Object center-point
+    square_position = (rect_center[0], rect_height+square_height/2)                                                                             # location to place square; same x-pos, y-pos = rect_height+center_sq
+
+    # Object mass and friction
+    ## Note: if the object size is changed, its initial position between box2d and pygame should be recalibrated
+    obj_density = obj_mass * 0.25 * 0.25                                                                                                        # area; sq.meter unit
+
+    # Box2Drect located at the left-bottom of the screen (y-up)
+    square_body = world.CreateDynamicBody(position= square_position, angle =0.0)
+    square_shape = Box2D.b2PolygonShape(box=square_center)
+    square_fixture = square_body.CreateFixture(shape=square_shape, density=obj_density, friction= obj_friction)
+
+    return {
+        "world": world, "rect_body": rect_body, "square_body": square_body,
+        "rect_position": rect_position, "square_position": square_position,
+        "rect_size": (rect_width, rect_height), "square_size": (square_width, square_height),
+        "screen_size": (SCREEN_WIDTH, SCREEN_HEIGHT), "wall_width": WALL_WIDTH,
+    }
+
+################################################################################ End World Initialization ####################################################################################
+
+
+######################################################################################## Game Loop ###########################################################################################
+
+# Runs the learner until it is done (two confirming deliveries), fails (weight > 1) or max_ticks.
+# filename: log in data/ (resumes the learner weight from its last row), None for no log.
+# monitor: convergence.ConvergenceMonitor that stops a stalled run early, the outcome is then its
+# reason code. None (default, the templates) runs until done/failed as the original templates.
+# Returns a summary of the run.
+def run(learner, filename=None, obj_mass=0.03, obj_friction=1.0, display=False, caption="ICO/ISO simulation",
+        max_ticks=None, verbose=None, monitor=None, **world_kwargs):
+    if verbose is None:
+        verbose = display
+    sim = make_world(obj_mass, obj_friction, **world_kwargs)
+    world, rect_body, square_body = sim["world"], sim["rect_body"], sim["square_body"]
+
+    logger = None
+    if filename is not None:
+        filecheck(filename)                                                                                                                     # Check file write available
+        learner.wa = load(filename)                                                                                                             # Adaptive weight; resumed from the last row of the log, then kept in memory
+        logger = BufferedLogger(filepath(filename), columns=True)                                                                               # Rows are written to the log (csv + .cols) in batches by a background thread
+
+    window = Window(sim, caption) if display else None
+
+    #Internal method for resetting the attempt
+    def reset():
+        rect_body.linearVelocity = (0, 0)                                                                                                       # MaximumlinearVelocity = 120 m/s
+        rect_body.position = sim["rect_position"]
+        square_body.linearVelocity = (0,0)
+        square_body.position = sim["square_position"]
+
+    ticks = 0
+    outcome = "max_ticks"
+    last_speed = None                                                                                                                           # o_speed of the last learning tick
+    start = time.perf_counter()
+
+    # Define the main game loop
+    while not learner.done() and (max_ticks is None or ticks < max_ticks):
+        if window is not None and not window.handle_events(reset):
+            outcome = "quit"
+            break
+
+        rect_pos = rect_body.position
+        square_pos = square_body.position
+
+        # Simulation time: wall clock with the window (as the original templates), simulated time headless
+        sim_time = window.ticks()/1000 if window is not None else ticks * TIME_STEP                                                             # second
+
+        speed, reset_world = learner.tick(square_pos.x, rect_pos.x, sim_time)
+        if learner.failed:
+            break
+        if learner.row is not None:
+            last_speed = learner.row[7]
+            if logger is not None:
+                logger.write(learner.row)
+
+        # stalled, oscillating or over budget: no need to go on
+        if monitor is not None and monitor.update(learner, speed, reset_world) is not None:
+            outcome = monitor.reason
+            print("Stopped on learning: ", outcome)
+            break
+
+        if verbose:
+            print('==============================================================================')
+            print('attempt: ', learner.attempt)
+            print("sim_time: ", sim_time)
+            if speed is not None:
+                print("o_speed: ", speed)
+
+        # Output to simulation
+        if speed is not None:
+            rect_body.linearVelocity = (speed, 0)
+        if reset_world:
+            reset()
+
+        if window is not None:
+            window.draw(rect_body, square_body)
+
+        world.Step(TIME_STEP, 1, 1)                                                                                                             # Step the Box2D world; step(timestep, vel_step, pos_step)
+        ticks += 1
+
+        if window is not None:
+            window.update()
+
+    if learner.failed:
+        outcome = "failed"
+        print("Failed on learning")
+    elif learner.redo >= 2:
+        outcome = "done"
+        if verbose:
+            print('Done simulation')
+
+    if logger is not None:
+        logger.close()
+    if window is not None:
+        window.close()
+
+    return {"rule": learner.rule, "obj_mass": obj_mass, "obj_friction": obj_friction, "outcome": outcome,
+            "attempts": learner.attempt, "weight": learner.wa, "speed": last_speed, "ticks": ticks, "sim_time": ticks * TIME_STEP,
+            "wall_time": time.perf_counter() - start}
+
+
+class Window:
+    # pygame window of the templates: drawing, keyboard and 60 fps pacing
+
+    def __init__(self, sim, caption):
+        import pygame
+        self.pygame = pygame
+        self.sim = sim
+        self.SCREEN_WIDTH, self.SCREEN_HEIGHT = sim["screen_size"]
+        pygame.init()                                                                                                                           # Initialize Pygame
+        self.screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))                                                          # Create the screen
+        pygame.display.set_caption(caption)                                                                                                     # Set the title of the screen
+        self.clock = pygame.time.Clock()                                                                                                        # Define the Pygame clock
+
+    def ticks(self):
+        return self.pygame.time.get_ticks()
+
+    def handle_events(self, reset):
+        # False when the window is closed or ESC is pressed
+        pygame = self.pygame
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return False
+
+        # Handle key presses
+        ## LinearVelocity is pixel/second (considering on PPM) i.e., if we want 2 m/s then we should use 2*PPM = 400
+        ## The rect_body.linearVelocity() will be the major output method in case of applying the other learning.
+        ## In this case we use the velocity unit of 1500 to make the object intentionally slide off the tray. The speed lower than that does not trigger the learning as it does not move through the reflexive area.
+        rect_body = self.sim["rect_body"]
+        keys = pygame.key.get_pressed()
+        if keys[pygame.K_LEFT]:
+            rect_body.linearVelocity = (-1500, 0)                                                                                               # For manual test; moving to the left
+            print(rect_body.linearVelocity)
+        if keys[pygame.K_RIGHT]:
+            rect_body.linearVelocity = (1.5*200, 0)                                                                                             # For manual test; moving to the right
+            print(rect_body.linearVelocity)
+        if keys[pygame.K_r]:
+            reset()                                                                                                                             # For manula test; manual reset position
+        if keys[pygame.K_ESCAPE]:
+            return False
+        return True
+
+    # Method use to rearrange the y-position between pygame and Box2D
+    def flip_y(self, y):
+        return self.SCREEN_HEIGHT-y
+
+    def draw(self, rect_body, square_body):
+        from renderer import BACKGROUND_COLOR, WALL_COLOR, RECT_COLOR, SQUARE_COLOR
+        pygame, screen = self.pygame, self.screen
+        SCREEN_WIDTH, SCREEN_HEIGHT, WALL_WIDTH = self.SCREEN_WIDTH, self.SCREEN_HEIGHT, self.sim["wall_width"]
+        rect_width, rect_height = self.sim["rect_size"]
+        square_width, square_height = self.sim["square_size"]
+        rect_pos, square_pos = rect_body.position, square_body.position
+
+        screen.fill(BACKGROUND_COLOR)                                                                                                           # Clear the screen
+
+        # Draw walls
+        pygame.draw.line(screen, WALL_COLOR, (0, SCREEN_HEIGHT), (SCREEN_WIDTH, SCREEN_HEIGHT), width = WALL_WIDTH)                             # Ground
+        pygame.draw.line(screen, WALL_COLOR, (0, 0), (SCREEN_WIDTH, 0), width = WALL_WIDTH)                                                     # Ceiling
+        pygame.draw.line(screen, WALL_COLOR, (0, 0), (0, SCREEN_WIDTH), width = WALL_WIDTH)                                                     # Left-Wall
+        pygame.draw.line(screen, WALL_COLOR, (SCREEN_WIDTH, 0), (SCREEN_WIDTH, SCREEN_HEIGHT), width = WALL_WIDTH)                              # Right-wall
+
+        # Draw rectangle; Rect(left, top, width, height)
+        pygame.draw.rect(screen, RECT_COLOR, pygame.Rect((rect_pos.x-rect_width/2, self.flip_y(rect_pos.y)-rect_height/2), (rect_width, rect_height), round=rect_body.angle))
+
+        # Draw square
+        pygame.draw.rect(screen, SQUARE_COLOR, pygame.Rect((square_pos.x-square_width/2, self.flip_y(square_pos.y)-square_height/2), (square_width, square_height), round=square_body.angle))
+
+    def update(self):
+        self.pygame.display.update()                                                                                                            # Update the Pygame display
+        self.clock.tick(60)                                                                                                                     # Limit the Pygame frame rate
+
+    def close(self):
+        self.pygame.quit()                                                                                                                      # Quit Pygame
+
+###################################################################################### End Game Loop #########################################################################################
+
+
+####################################################################################### Data management part #######################################################################################
+
+def filepath(filename):
+    script_path = os.path.abspath(__file__)
+    script_dir = os.path.split(script_path)[0]
+    rel_path = "data/"+filename
+    path = os.path.join(script_dir, rel_path)
+    return path
+
+#Create CSV file
+def create(filename):
+    try:
+        #create file
+        path = filepath(filename)
+        with open(path,'w', newline='') as open_dat:
+            #Header
+            open_dat.write(",".join(HEADER) + "\r\n")
+            print("[INFO]: File: "+filename+" has been created")
+    except:
+        print("[ERROR]: Cannot create: ", filename)
+        time.sleep(30)
+        sys.exit()
+
+def filecheck(filename):
+    path = filepath(filename)
+    try:
+        if (os.path.exists(path) == True):
+            print("[INFO]: File exists")
+        else:
+            print("[INFO]: Creates a new file")
+            create(filename)
+    except:
+        print("[ERROR]: File check error, please check filename")
+        time.sleep(30)
+        sys.exit()
+
+#Load weight information from the target file.
+#Only the end of the file is read to find the last row, so the cost does not grow with the log.
+def load(filename):
+    path = filepath(filename)
+    try:
+        with open(path, 'rb') as f:
+            try:
+                end = f.seek(0, os.SEEK_END)
+                start = end
+                tail = b''
+                while start > 0 and tail.count(b'\n') < 2:
+                    start = max(0, start - 4096)
+                    f.seek(start)
+                    tail = f.read(end - start)
+                last_line = tail.splitlines()[-1].decode()
+                line = last_line.split(',')
+                weight = float(line[2])
+                return weight
+            except:
+                print("[INFO]: No trace of previous weight, return 0.0")
+                return 0.0
+
+    except:
+        print("[ERRROR]: Cannot load weight from: ", filename)
+        time.sleep(30)
+        sys.exit()
+
+##################################################################################### End Data management part #####################################################################################
@@ -10,9 +10,15 @@ import gymnasium as gym
 import numpy as np
 
 import os 
+import sys
 import time
 
+from advantages import compute_gae
+from checkpoint import CheckpointWriter, atomic_save, to_cpu, snapshot, load_checkpoint, restore
+from rollout import RolloutBuffer
 from env import DeliveryEnv
+from vector_env import DeliveryVectorEnv
+from shm_vector_env import SharedMemoryDeliveryVectorEnv
 import numpy as np
 
 import signal
@@ -25,7 +31,7 @@ def layer_init(layer, std=np.sqrt(2), bias_const=0.0):
 def save_model(model, note):
     print("Saving model..")
     save_path = f"runs/trained_models/{run_name}_step_"+str(note)+".pth"
-    torch.save(model, save_path)    
+    atomic_save(model, save_path)
 
 class Agent(nn.Module):
     def __init__(self, envs):
@@ -72,8 +78,13 @@ class Agent(nn.Module):
 if __name__ == "__main__":
 
 
-    run_name = time.time()
-    writer = SummaryWriter(f"runs/{run_name}")
+    # python load_RL_model.py <checkpoint file or directory> goes on with a saved run (see checkpoint.py)
+    resume = sys.argv[1] if len(sys.argv) > 1 else None
+    checkpoint = None if resume is None else load_checkpoint(resume)
+
+    run_name = time.time() if checkpoint is None else checkpoint["run_name"]
+    # a resumed run drops the events the stopped run logged after its checkpoint
+    writer = SummaryWriter(f"runs/{run_name}", purge_step=None if checkpoint is None else checkpoint["global_step"] + 1)
 
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
@@ -89,15 +100,26 @@ if __name__ == "__main__":
             return env
         return thunk
 
-    envs = gym.vector.AsyncVectorEnv([make_env() for i in range(num_envs)])
+    # "native": all envs are stepped in this process by DeliveryVectorEnv (same wrappers built-in)
+    # "shm"   : envs split over worker processes, outputs are written in shared memory
+    # "async" : one process per env (no env state in the checkpoints, a resumed run starts new
+    #           episodes with new normaliser statistics)
+    env_backend = "native"
+    if env_backend == "native":
+        envs = DeliveryVectorEnv(num_envs, normalize_obs=True)
+    elif env_backend == "shm":
+        envs = SharedMemoryDeliveryVectorEnv(num_envs, normalize_obs=True)
+    else:
+        envs = gym.vector.AsyncVectorEnv([make_env() for i in range(num_envs)])
 
     # Define the path to the saved model file
     # Don't forget to update the environment (i.e. object weight, friction) to match the model
     agent_path = "D:\\delivery_sim\\runs\\eval\\18-25cmsq_3kg_0.5f\\18-25cmsq_3kg_0.5f.pth"
 
     agent = Agent(envs).to(device)
-    # load state dictionary
-    agent.load_state_dict(torch.load(agent_path))
+    # load state dictionary (a resumed run gets the agent of its checkpoint)
+    if checkpoint is None:
+        agent.load_state_dict(torch.load(agent_path))
     # set evaluation mode
     agent.eval()
     optimizer = optim.Adam(agent.parameters(), lr=learning_rate, eps=1e-5)
@@ -118,50 +140,65 @@ if __name__ == "__main__":
     vf_coef  =  0.5
     max_grad_norm = 0.5
 
-    # storage setup
-    obs = torch.zeros((num_steps, num_envs) + obs_shape).to(device)
-    actions = torch.zeros((num_steps, num_envs) + act_shape).to(device)
-    logprobs = torch.zeros((num_steps, num_envs)).to(device)
-    rewards = torch.zeros((num_steps, num_envs)).to(device)
-    dones   = torch.zeros((num_steps, num_envs)).to(device)
-    values  = torch.zeros((num_steps, num_envs)).to(device)
+    # a checkpoint every checkpoint_every updates in runs/checkpoints/<run_name>, the last checkpoint_keep are kept
+    checkpoint_every = 10
+    checkpoint_keep = 3
+
+    # storage setup, see rollout.py
+    rollout = RolloutBuffer(num_steps, num_envs, obs_shape, act_shape, device)
+    actions, logprobs, values = rollout.actions, rollout.logprobs, rollout.values
 
 
     # start the game
     global_step = 0
+    start_update = 1
     start_time = time.time()
-    next_obs, _  = envs.reset()
-    next_obs = torch.Tensor(next_obs).to(device)
-    next_done = torch.zeros(num_envs).to(device)
+    eval_cnt = 0
+    if checkpoint is None:
+        rollout.reset(envs)
+    else:
+        global_step, update = restore(checkpoint, agent, optimizer, envs, rollout)
+        start_update = update + 1
+        start_time -= checkpoint["elapsed"]
+        eval_cnt = checkpoint["eval_cnt"]
+        del checkpoint
+    checkpoints = CheckpointWriter(f"runs/checkpoints/{run_name}", keep=checkpoint_keep)
     num_updates = 100000
     video_filenames = set()
 
-    # save when triggered ctrl-c
-    model = agent.state_dict()
-    signal.signal(signal.SIGINT, lambda sig, frame: save_model(model, note))
-    note = 0
-    eval_cnt = 0
+    # ctrl-c: the model and a checkpoint of the current state are saved at the end of the update
+    save_requested = False
+    def request_save(sig, frame):
+        global save_requested
+        save_requested = True
+    signal.signal(signal.SIGINT, request_save)
 
-    for update in range(1, num_updates + 1):
+    for update in range(start_update, num_updates + 1):
 
+        rollout.start()
         for step in range(0, num_steps): # small trajectory 
             global_step += 1*num_envs
-            obs[step]   = next_obs
-            dones[step] = next_done
+            next_obs = rollout.obs_on_device(step)
 
             # Algo logic
             with torch.no_grad():
                 action, logprob, _, value = agent.get_action_and_value(next_obs)
                 values[step] = value.flatten()
 
-            actions[step]  = action
             logprobs[step] = logprob
 
-            next_obs, reward, terminated, truncated, infos = envs.step(action.cpu().numpy())
-            done = np.logical_or(terminated, truncated)
-            rewards[step] = torch.tensor(reward).to(device).view(-1)
-            next_obs = torch.Tensor(next_obs).to(device)
-            next_done = torch.Tensor(done).to(device)
+            # the env writes its outputs straight into the rollout buffers
+            rollout.bind(envs, step)
+            next_obs, reward, terminated, truncated, infos = envs.step(rollout.set_actions(step, action))
+            rollout.store(next_obs, reward, terminated, truncated)
+
+            # a truncated episode is bootstrapped from the value of its final observation (see advantages.py),
+            # unless its last step also terminated it (drop or delivery)
+            bootstrap = np.asarray(truncated) & ~np.asarray(terminated)
+            if bootstrap.any():
+                final_obs = torch.as_tensor(np.stack(infos["final_observation"][bootstrap]), dtype=torch.float32).to(device)
+                with torch.no_grad():
+                    rollout.final_values[step, torch.as_tensor(bootstrap).to(device)] = agent.get_value(final_obs).flatten()
 
             if "final_info" not in infos:
                 continue
@@ -187,22 +224,10 @@ if __name__ == "__main__":
 
         # bootstrap value if not done
         with torch.no_grad():
-            next_value = agent.get_value(next_obs).reshape(1, -1)
-            advantages = torch.zeros_like(rewards).to(device)
-            lastgaelam = 0
-
-            for t in reversed(range(num_steps)):
-                if t == num_steps - 1:
-                    nextnonterminal = 1.0 - next_done
-                    nextvalues = next_value
-                else:
-                    nextnonterminal = 1.0 - dones[t+1]
-                    nextvalues = values[t+1]
-
-                delta = rewards[t] + gamma*nextvalues * nextnonterminal - values[t]
-                advantages[t] = lastgaelam = delta + gamma * gae_lambda * nextnonterminal * lastgaelam
-
-            returns = advantages + values
+            obs, rewards, dones, next_done, truncs = rollout.device_tensors()
+            next_value = agent.get_value(rollout.obs_on_device(num_steps)).reshape(1, -1)
+            advantages, returns = compute_gae(rewards, values, dones, next_value, next_done, gamma, gae_lambda,
+                                              truncations=truncs, final_values=rollout.final_values)
 
 
         # flatten the batch
@@ -293,8 +318,21 @@ if __name__ == "__main__":
         print("SPS:", int(global_step / (time.time() - start_time)))
         writer.add_scalar("charts/SPS", int(global_step / (time.time() - start_time)), global_step)
 
-    note = 'ctrl-c'
-    save_model(model, note)
+        # the worlds are put in the canonical form of a restored env after every update, checkpoint or
+        # not, so the run does not depend on checkpoint_every and a resumed run goes on exactly the same
+        if hasattr(envs, "canonicalize"):
+            envs.canonicalize()
+
+        # written in the background, the next update starts at once
+        if update % checkpoint_every == 0 or update == num_updates or save_requested:
+            checkpoints.save(snapshot(agent, optimizer, envs, rollout, global_step, update,
+                                      run_name=run_name, elapsed=time.time() - start_time, eval_cnt=eval_cnt), update)
+        if save_requested:
+            save_model(to_cpu(agent.state_dict()), 'ctrl-c')
+            save_requested = False
+
+    checkpoints.close()
+    save_model(to_cpu(agent.state_dict()), 'ctrl-c')
 
     envs.close()
     writer.close()
\ No newline at end of file
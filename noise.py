@@ -0,0 +1,168 @@
+# Seeded sensor noise of the learner templates and DeliveryEnv observations.
+#
+# A NoiseStream draws its values from a seeded np.random.Generator in blocks of block_size values and
+# hands them out one at a time (next) or as arrays (take), so a reading costs a list index instead
+# of a call into the generator. The values are the same as drawing them one by one from the same
+# generator (e.g. UniformNoise(0, 5, seed=0) gives the values of rng.integers(0, 5) calls).
+#
+# apply(x) puts the noise on a reading, a float or an array (one value per element), apply_into(x)
+# on a float64 array in place (no new array while the values come from the current block):
+#   UniformNoise(low, high) : + integer in [low, high), the 0-4 px bias of the _with_noise templates
+#   GaussianNoise(std, mean): + normal value
+#   DropoutNoise(p)         : with probability p the reading is lost and the last reading is kept
+#   NoiseChain(a, b, ...)   : a, then b, ...
+# Other distributions are a subclass with its own generate(size) (abstract, a subclass without it can
+# not be built) and apply/apply_into when it is not additive.
+#
+# Used by Learner(noise=...) (see learner.py) and DeliveryEnv(obs_noise=...) (see env.py).
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+class NoiseStream(ABC):
+
+    def __init__(self, seed=None, block_size=4096, rng=None):
+        self.block_size = block_size
+        self.seed(seed, rng)
+
+    def seed(self, seed=None, rng=None):
+        # new generator, the values of the current block are dropped
+        self.rng = np.random.default_rng(seed) if rng is None else rng
+        self.block = self.generate(0)
+        self.values = []
+        self.index = 0
+        self.reset()
+
+    def reset(self):
+        # start of a new episode/run (state of the stream that is not the generator)
+        pass
+
+    @abstractmethod
+    def generate(self, size):
+        # array of the next size values of the distribution, drawn from self.rng
+        pass
+
+    def refill(self):
+        self.block = self.generate(self.block_size)
+        self.values = self.block.tolist()
+        self.index = 0
+
+    def next(self):
+        if self.index >= len(self.values):
+            self.refill()
+        value = self.values[self.index]
+        self.index += 1
+        return value
+
+    def take(self, n):
+        # the next n values as an array
+        parts = []
+        while n > 0:
+            if self.index >= len(self.values):
+                self.refill()
+            count = min(n, len(self.values) - self.index)
+            parts.append(self.block[self.index:self.index+count])
+            self.index += count
+            n -= count
+        if len(parts) == 1:
+            return parts[0].copy()
+        return np.concatenate(parts) if parts else self.generate(0)
+
+    def next_values(self, n):
+        # the next n values, a view of the current block when they are all in it (no new array)
+        if self.index + n <= len(self.block):
+            values = self.block[self.index:self.index+n]
+            self.index += n
+            return values
+        return self.take(n)
+
+    def apply_into(self, x):
+        # apply() of an array, written into x
+        x += self.next_values(x.size).reshape(x.shape)
+
+    def apply(self, x):
+        if isinstance(x, (int, float)):
+            return x + self.next()
+        x = np.asarray(x)
+        return x + self.take(x.size).reshape(x.shape)
+
+
+class UniformNoise(NoiseStream):
+
+    def __init__(self, low=0, high=5, seed=None, block_size=4096, rng=None):
+        self.low, self.high = low, high
+        super().__init__(seed, block_size, rng)
+
+    def generate(self, size):
+        return self.rng.integers(self.low, self.high, size=size)
+
+
+class GaussianNoise(NoiseStream):
+
+    def __init__(self, std=1.0, mean=0.0, seed=None, block_size=4096, rng=None):
+        self.std, self.mean = std, mean
+        super().__init__(seed, block_size, rng)
+
+    def generate(self, size):
+        return self.rng.normal(self.mean, self.std, size=size)
+
+
+class DropoutNoise(NoiseStream):
+    # the values are True for a lost reading
+
+    def __init__(self, p=0.05, seed=None, block_size=4096, rng=None):
+        self.p = p
+        super().__init__(seed, block_size, rng)
+
+    def reset(self):
+        self.last = None                                # last reading that got through
+
+    def generate(self, size):
+        return self.rng.random(size) < self.p
+
+    def apply(self, x):
+        if isinstance(x, (int, float)):
+            if self.next() and self.last is not None:
+                return self.last
+            self.last = x
+            return x
+        x = np.array(x)
+        dropped = self.take(x.size).reshape(x.shape)
+        if self.last is not None:
+            x[dropped] = self.last[dropped]
+        self.last = x.copy()
+        return x
+
+    def apply_into(self, x):
+        dropped = self.next_values(x.size).reshape(x.shape)
+        if self.last is None or self.last.shape != x.shape:
+            self.last = x.copy()
+            return
+        np.copyto(x, self.last, where=dropped)
+        self.last[...] = x
+
+
+class NoiseChain:
+
+    def __init__(self, *streams):
+        self.streams = streams
+
+    def seed(self, seed=None):
+        # one generator per stream, all from the same seed
+        for stream, child in zip(self.streams, np.random.SeedSequence(seed).spawn(len(self.streams))):
+            stream.seed(rng=np.random.default_rng(child))
+
+    def reset(self):
+        for stream in self.streams:
+            stream.reset()
+
+    def apply(self, x):
+        for stream in self.streams:
+            x = stream.apply(x)
+        return x
+
+    def apply_into(self, x):
+        for stream in self.streams:
+            stream.apply_into(x)
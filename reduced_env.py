@@ -0,0 +1,129 @@
+# Reduced-physics backend of the delivery task.
+#
+# The task is essentially 1-D: the tray is driven by its linearVelocity and the box is only held by
+# Coulomb friction. This backend simulates the tray/box pair with NumPy for thousands of envs at
+# once and keeps the observation/reward/termination contract of DeliveryEnv (see DeliveryVectorEnv).
+#
+# Model (per physics sub-step, same dt and 10 sub-steps per action as DeliveryEnv):
+#   box : its velocity moves towards the tray velocity by at most mu*g*dt (sticks when it is closer)
+#   tray: slowed down by the ground friction and the reaction of the box friction
+#   walls clamp both bodies, a box pushed over the tray edge keeps its velocity (no friction)
+#   a body moves at most max_translation px per sub-step, its velocity is scaled down like in Box2D
+#   (b2_maxTranslation = 2 units; this caps the speed to 120 px/s at the 1/60 s step of the templates)
+# Units are the Box2D units used by DeliveryEnv (pixels, gravity 9.81 px/s^2), the friction is mixed
+# the same way as Box2D: mu = sqrt(friction_a * friction_b).
+#
+# Not modelled: the vertical settling of the bodies at the start, rotation and the fall of the box
+# off the tray. Use benchmarks/fidelity_reduced_env.py to check the error against Box2D.
+
+import numpy as np
+
+from vector_env import DeliveryVectorEnv, per_env_params, RECT_X, RECT_VX, SQUARE_X, SQUARE_VX
+
+
+class ReducedDeliveryVectorEnv(DeliveryVectorEnv):
+
+    def make_envs(self, num_envs, obj_mass=0.3, obj_friction=1.0, obj_size=(0.25, 0.25), rect_mass=10, rect_friction=1.0,
+                  rect_size=(1, 0.25), gravity=9.81, ground_friction=1.0, substeps=10, target_fps=1000,
+                  max_translation=2.0):
+        self.PPM = 200
+        self.SCREEN_WIDTH = 800
+        self.substeps = substeps
+        self.TIME_STEP = 1.0 / target_fps
+        self.max_speed = max_translation * target_fps
+        self.mu_ground_base = ground_friction
+
+        # per-env physical parameters (same names and units as DeliveryEnv.set_params)
+        self.params = {}
+        self.set_params(obj_mass=obj_mass, obj_friction=obj_friction, obj_size=obj_size, rect_mass=rect_mass,
+                        rect_friction=rect_friction, rect_size=rect_size, gravity=gravity)
+
+        return []
+
+    def set_params(self, **params):
+        for name, value in per_env_params(params, self.num_envs).items():
+            self.params[name] = value.copy()
+
+        PPM = self.PPM
+        obj_w, obj_h = self.params["obj_size"][:, 0], self.params["obj_size"][:, 1]
+        rect_w, rect_h = self.params["rect_size"][:, 0], self.params["rect_size"][:, 1]
+
+        # same geometry as DeliveryEnv
+        self.rect_half_width = rect_w * PPM / 2
+        self.square_half_width = obj_w * PPM / 2
+
+        # same masses as DeliveryEnv (density = mass*area in meter, times the area in px^2)
+        self.rect_mass = self.params["rect_mass"] * rect_w * rect_h * (rect_w * PPM) * (rect_h * PPM)
+        self.obj_mass = self.params["obj_mass"] * obj_w * obj_h * (obj_w * PPM) * (obj_h * PPM)
+        self.mu_obj = np.sqrt(self.params["obj_friction"] * self.params["rect_friction"])
+        self.mu_ground = np.sqrt(self.params["rect_friction"] * self.mu_ground_base)
+        self.gravity = self.params["gravity"]
+
+        # wall limits of the body centres
+        self.rect_limits = (self.rect_half_width, self.SCREEN_WIDTH - self.rect_half_width)
+        self.square_limits = (self.square_half_width, self.SCREEN_WIDTH - self.square_half_width)
+
+    def reset_envs(self, mask):
+        # the object starts in the middle of the tray
+        self.state[mask, RECT_X] = self.rect_half_width[mask]
+        self.state[mask, RECT_VX] = 0
+        self.state[mask, SQUARE_X] = self.rect_half_width[mask]
+        self.state[mask, SQUARE_VX] = 0
+
+    def simulate(self, actions):
+        rect_vx = self.state[:, RECT_VX]
+
+        # rescale action
+        rect_vx[:] = actions * 10
+
+        self.integrate()
+
+    def integrate(self):
+        # self.substeps physics sub-steps from the current state (tray velocity already set)
+        dt = self.TIME_STEP
+        state = self.state
+        rect_x, rect_vx = state[:, RECT_X], state[:, RECT_VX]
+        square_x, square_vx = state[:, SQUARE_X], state[:, SQUARE_VX]
+
+        # maximum velocity change per sub-step from the friction
+        box_dv_max = self.mu_obj * self.gravity * dt
+        mass_ratio = self.obj_mass / self.rect_mass
+        ground_dv_max = self.mu_ground * self.gravity * dt * (1 + mass_ratio)
+
+        for _ in range(self.substeps):
+            on_tray = np.abs(square_x - rect_x) <= self.rect_half_width
+
+            # box friction; the same impulse acts in the opposite direction on the tray
+            box_dv = np.clip(rect_vx - square_vx, -box_dv_max, box_dv_max)
+            box_dv *= on_tray
+            square_vx += box_dv
+            rect_vx -= box_dv * mass_ratio
+
+            # ground friction on the tray
+            rect_vx -= np.clip(rect_vx, -ground_dv_max, ground_dv_max)
+
+            # maximum translation per step
+            np.clip(rect_vx, -self.max_speed, self.max_speed, out=rect_vx)
+            np.clip(square_vx, -self.max_speed, self.max_speed, out=square_vx)
+
+            rect_x += rect_vx * dt
+            square_x += square_vx * dt
+
+            # walls
+            self.clamp(rect_x, rect_vx, self.rect_limits)
+            self.clamp(square_x, square_vx, self.square_limits)
+
+    def clamp(self, x, vx, limits):
+        low, high = limits
+        hit = (x < low) | (x > high)
+        if hit.any():
+            np.clip(x, low, high, out=x)
+            vx[hit] = 0
+
+    def canonicalize(self):
+        # no hidden solver state
+        pass
+
+    def read_state(self, mask=None):
+        # the state is simulated in place
+        pass
@@ -0,0 +1,71 @@
+# Important note: pygame and box2d has different starting axis
+# pygame: (0,0) at the top-left (y-down)
+# Box2D: (0,0) at the bottom-left (y-up)
+#
+# Drawing part of the DeliveryEnv. This module is only imported by env.py when a render mode
+# (or real-time pacing) is requested, so headless RL workers never import pygame or init SDL.
+
+import pygame
+
+
+# Colours
+BACKGROUND_COLOR = (255, 255, 255)                                                                                                          # White
+WALL_COLOR = (0, 0, 0)                                                                                                                      # Black
+RECT_COLOR = (255, 0, 0)                                                                                                                    # Red
+SQUARE_COLOR = (0, 0, 255)                                                                                                                  # Blue
+
+
+def make_clock():
+    # pygame clock used for real-time pacing of the physics steps
+    return pygame.time.Clock()
+
+
+class DeliveryRenderer:
+
+    def __init__(self, env, caption="Delivery simulation"):
+        self.env = env
+
+        # geometry is taken from the env so the drawing always matches the Box2D bodies
+        self.SCREEN_WIDTH = env.SCREEN_WIDTH
+        self.SCREEN_HEIGHT = env.SCREEN_HEIGHT
+        self.WALL_WIDTH = env.WALL_WIDTH
+
+        pygame.init()
+        self.screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+        pygame.display.set_caption(caption)
+
+    # Method use to rearrange the y-position between pygame and Box2D
+    def flip_y(self, y):
+        return self.SCREEN_HEIGHT-y
+
+    def draw(self):
+        env = self.env
+        rect_pos = env.rect_body.position
+        square_pos = env.square_body.position
+        rect_rot = env.rect_body.angle
+        square_rot = env.square_body.angle
+
+        self.screen.fill(BACKGROUND_COLOR)
+        pygame.draw.line(self.screen, WALL_COLOR, (0, self.SCREEN_HEIGHT), (self.SCREEN_WIDTH, self.SCREEN_HEIGHT), width = self.WALL_WIDTH)                         # Ground
+        pygame.draw.line(self.screen, WALL_COLOR, (0, 0), (self.SCREEN_WIDTH, 0), width = self.WALL_WIDTH)                                                 # Ceiling
+        pygame.draw.line(self.screen, WALL_COLOR, (0, 0), (0, self.SCREEN_WIDTH), width = self.WALL_WIDTH)                                                 # Left-Wall
+        pygame.draw.line(self.screen, WALL_COLOR, (self.SCREEN_WIDTH, 0), (self.SCREEN_WIDTH, self.SCREEN_HEIGHT), width = self.WALL_WIDTH)                          # Right-wall
+
+        pygame.draw.rect(self.screen,
+            RECT_COLOR,
+            pygame.Rect((rect_pos.x-env.rect_center[0],
+                self.flip_y(rect_pos.y)-env.rect_center[1]),
+                (env.rect_width, env.rect_height), round=rect_rot))
+
+
+        pygame.draw.rect(self.screen,
+            SQUARE_COLOR,
+            pygame.Rect((square_pos.x-env.square_center[0],
+                self.flip_y(square_pos.y)-env.square_center[1]),
+                (env.square_width, env.square_height), round=square_rot))
+
+        pygame.display.flip()
+        pygame.display.update()
+
+    def close(self):
+        pygame.quit()
@@ -0,0 +1,121 @@
+# Rollout storage of the PPO trainers.
+#
+# RolloutBuffer owns the buffers of one rollout (num_steps x num_envs), allocated once:
+#   host (pinned when the device is CUDA), also as NumPy views (obs_np, rewards_np, ...):
+#     obs[t]          : float32 observation before step t, obs[num_steps] is the next one
+#     rewards[t]      : float32 reward of step t
+#     terminations[t], truncations[t]: bool, the episode ended with step t-1 ([0] from the last rollout)
+#     actions_host[t] : actions given to the env
+#   device: actions, logprobs, values, final_values (the agent outputs)
+# reset(envs) once, then start() at the beginning of every rollout. Before each step, bind(envs, t)
+# makes a DeliveryVectorEnv write its outputs of step t straight into obs[t+1], rewards[t],
+# terminations[t+1] and truncations[t+1] (use_buffers without copy), so the env outputs are neither
+# allocated nor converted. Other vector envs (shared-memory, gymnasium Async) return their own
+# arrays, store() copies them into the same rows.
+#
+# The float32 dones and truncations in the layout of compute_gae are built once per rollout by
+# dones() (and moved to the device by device_tensors()).
+#
+# Between two rollouts the state of the buffer is its last row (the first one of the next rollout)
+# and the actions (logged during the next rollout), get_state()/set_state() save and restore them
+# for the checkpoints (see checkpoint.py).
+
+import numpy as np
+import torch
+
+
+class RolloutBuffer:
+
+    def __init__(self, num_steps, num_envs, obs_shape, act_shape, device):
+        self.num_steps = num_steps
+        self.num_envs = num_envs
+        self.device = torch.device(device)
+        on_host = self.device.type == "cpu"
+        pin = self.device.type == "cuda"
+
+        def host(shape, dtype=torch.float32):
+            return torch.zeros(shape, dtype=dtype, pin_memory=pin)
+
+        self.obs = host((num_steps + 1, num_envs) + tuple(obs_shape))
+        self.rewards = host((num_steps, num_envs))
+        self.terminations = host((num_steps + 1, num_envs), torch.bool)
+        self.truncations = host((num_steps + 1, num_envs), torch.bool)
+
+        # agent outputs, on the device; the actions also on the host for the env
+        self.actions = torch.zeros((num_steps, num_envs) + tuple(act_shape), device=self.device)
+        self.logprobs = torch.zeros((num_steps, num_envs), device=self.device)
+        self.values = torch.zeros((num_steps, num_envs), device=self.device)
+        self.final_values = torch.zeros((num_steps, num_envs), device=self.device)  # value of the final observation of a truncated step
+        self.actions_host = self.actions if on_host else host((num_steps, num_envs) + tuple(act_shape))
+
+        # NumPy views of the host buffers (same memory)
+        self.obs_np = self.obs.numpy()
+        self.rewards_np = self.rewards.numpy()
+        self.terminations_np = self.terminations.numpy()
+        self.truncations_np = self.truncations.numpy()
+        self.actions_np = self.actions_host.numpy()
+
+        self.rows = None                                # rows of the step bound by bind()
+
+    def reset(self, envs, seed=None):
+        # first observation of the training, it becomes obs[0] with start(); returns the infos of envs.reset
+        self.bind(envs, self.num_steps - 1)
+        next_obs, infos = envs.reset(seed=seed)
+        self.store(next_obs, None, False, False)
+        return infos
+
+    def start(self):
+        # new rollout: the last observation/dones of the previous one are the first ones of this one
+        self.obs[0] = self.obs[self.num_steps]
+        self.terminations[0] = self.terminations[self.num_steps]
+        self.truncations[0] = self.truncations[self.num_steps]
+
+    def get_state(self):
+        # last observation/dones (the start of the next rollout) and the actions
+        last = self.num_steps
+        return {"obs": self.obs[last].clone(), "terminations": self.terminations[last].clone(),
+                "truncations": self.truncations[last].clone(), "actions": self.actions.clone()}
+
+    def set_state(self, state):
+        last = self.num_steps
+        self.obs[last] = state["obs"]
+        self.terminations[last] = state["terminations"]
+        self.truncations[last] = state["truncations"]
+        self.actions[...] = state["actions"]
+        if self.actions_host is not self.actions:
+            self.actions_host.copy_(self.actions)
+
+    def bind(self, envs, step):
+        # the outputs of the next envs.step go straight into the rows of this step
+        self.rows = (self.obs_np[step + 1], self.rewards_np[step], self.terminations_np[step + 1], self.truncations_np[step + 1])
+        if hasattr(envs, "use_buffers"):
+            envs.use_buffers(*self.rows, copy=False)
+
+    def store(self, next_obs, reward, terminated, truncated):
+        # copies the outputs of envs.step into the bound rows when the env did not write them there
+        for row, value in zip(self.rows, (next_obs, reward, terminated, truncated)):
+            if value is not row and value is not None:
+                np.copyto(row, value, casting="unsafe")
+
+    def set_actions(self, step, action):
+        # action of the agent (device tensor), returns the host array for envs.step
+        self.actions[step] = action
+        if self.actions_host is not self.actions:
+            self.actions_host[step].copy_(action)
+        return self.actions_np[step]
+
+    def obs_on_device(self, step):
+        # observation before the given step (the input of the agent), obs_on_device(num_steps) after the rollout
+        return self.obs[step].to(self.device, non_blocking=True)
+
+    def dones(self):
+        # (dones, next_done, truncations) as float32 in the layout of advantages.compute_gae; a step both
+        # terminated and truncated ends with a value of 0, it is not bootstrapped
+        ends = (self.terminations | self.truncations).float()
+        return ends[:-1], ends[-1], (self.truncations[1:] & ~self.terminations[1:]).float()
+
+    def device_tensors(self):
+        # obs, rewards, dones, next_done and truncations of the rollout on the device
+        dones, next_done, truncations = self.dones()
+        tensors = (self.obs[:-1], self.rewards, dones, next_done, truncations)
+        return [tensor.to(self.device, non_blocking=True) for tensor in tensors]
@@ -0,0 +1,205 @@
+# Shared-memory version of the env pool.
+#
+# The envs are split over worker processes (each worker runs a DeliveryVectorEnv on its slice).
+# Actions, observations, rewards and terminated/truncated flags live in one shared-memory block:
+# the workers write their outputs straight into it and the trainer reads it as NumPy arrays
+# (or torch tensors, see torch_buffers) without any pickling or copy. The pipes only carry the
+# short step/reset commands and the final infos of finished episodes.
+#
+# As with DeliveryVectorEnv, the arrays returned by reset/step are overwritten on the next call.
+
+import multiprocessing as mp
+import os
+import traceback
+
+import numpy as np
+import gymnasium as gym
+
+from env import DeliveryEnv
+from vector_env import DeliveryVectorEnv, per_env_params
+
+
+def buffer_layout(num_envs, obs_shape):
+    # (name, dtype, shape) of the arrays inside the shared block, largest alignment first
+    return [
+        ("actions", np.float64, (num_envs,)),
+        ("observations", np.float32, (num_envs,) + obs_shape),
+        ("rewards", np.float32, (num_envs,)),
+        ("terminations", np.bool_, (num_envs,)),
+        ("truncations", np.bool_, (num_envs,)),
+    ]
+
+
+def buffer_views(block, num_envs, obs_shape):
+    views = {}
+    offset = 0
+    for name, dtype, shape in buffer_layout(num_envs, obs_shape):
+        count = int(np.prod(shape))
+        views[name] = np.frombuffer(block, dtype=dtype, count=count, offset=offset).reshape(shape)
+        offset += count * np.dtype(dtype).itemsize
+    return views
+
+
+def buffer_size(num_envs, obs_shape):
+    return sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, dtype, shape in buffer_layout(num_envs, obs_shape))
+
+
+def worker(index, start, end, pipe, parent_pipe, block, num_envs, obs_shape, vector_env_cls, env_kwargs):
+    parent_pipe.close()
+    envs = None
+    try:
+        buffers = buffer_views(block, num_envs, obs_shape)
+        envs = vector_env_cls(end - start, **env_kwargs)
+        envs.use_buffers(buffers["observations"][start:end], buffers["rewards"][start:end],
+                         buffers["terminations"][start:end], buffers["truncations"][start:end])
+        actions = buffers["actions"][start:end]
+
+        while True:
+            command, data = pipe.recv()
+            if command == "step":
+                _, _, _, _, infos = envs.step(actions)
+                pipe.send((True, infos))
+            elif command == "reset":
+                _, infos = envs.reset(**data)
+                pipe.send((True, infos))
+            elif command == "call":
+                name, args, kwargs = data
+                pipe.send((True, getattr(envs, name)(*args, **kwargs)))
+            elif command == "close":
+                pipe.send((True, None))
+                break
+            else:
+                raise RuntimeError(f"Received unknown command `{command}`")
+
+    except (KeyboardInterrupt, Exception):
+        pipe.send((False, f"worker {index}:\n" + traceback.format_exc()))
+    finally:
+        if envs is not None:
+            envs.close()
+        pipe.close()
+
+
+class SharedMemoryDeliveryVectorEnv(gym.vector.VectorEnv):
+
+    def __init__(self, num_envs, num_workers=None, vector_env_cls=DeliveryVectorEnv, context=None, **env_kwargs):
+        # env_kwargs are forwarded to vector_env_cls (e.g. normalize_obs=True, obj_mass=3.0)
+        super().__init__(num_envs, DeliveryEnv.observation_space, DeliveryEnv.action_space)
+
+        if num_workers is None:
+            num_workers = min(num_envs, os.cpu_count() or 1)
+        self.num_workers = num_workers
+
+        ctx = mp.get_context(context)
+        obs_shape = self.single_observation_space.shape
+        self.block = ctx.RawArray("b", buffer_size(num_envs, obs_shape))
+        buffers = buffer_views(self.block, num_envs, obs_shape)
+        self.actions = buffers["actions"]
+        self.observations = buffers["observations"]
+        self.rewards = buffers["rewards"]
+        self.terminations = buffers["terminations"]
+        self.truncations = buffers["truncations"]
+
+        # contiguous slice of envs per worker
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.slices = list(zip(bounds[:-1], bounds[1:]))
+
+        self.pipes, self.processes = [], []
+        for index, (start, end) in enumerate(self.slices):
+            parent_pipe, child_pipe = ctx.Pipe()
+            process = ctx.Process(
+                target=worker,
+                name=f"Worker<{type(self).__name__}>-{index}",
+                args=(index, start, end, child_pipe, parent_pipe, self.block, num_envs, obs_shape, vector_env_cls, env_kwargs),
+                daemon=True,
+            )
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+            process.start()
+            child_pipe.close()
+
+    def torch_buffers(self):
+        # torch tensors sharing memory with the NumPy arrays (no copy), e.g. for torch.Tensor.copy_
+        import torch
+        return {
+            "observations": torch.from_numpy(self.observations),
+            "rewards": torch.from_numpy(self.rewards),
+            "terminations": torch.from_numpy(self.terminations),
+            "truncations": torch.from_numpy(self.truncations),
+        }
+
+    def send(self, command, data=None):
+        for pipe in self.pipes:
+            pipe.send((command, data))
+
+    def receive(self):
+        results, errors = [], []
+        for pipe in self.pipes:
+            success, result = pipe.recv()
+            (results if success else errors).append(result)
+        if errors:
+            self.close_extras(terminate=True)
+            raise RuntimeError("Error in the shared-memory env workers\n" + "\n".join(errors))
+        return results
+
+    def merge_infos(self, results):
+        # the workers report their final infos on their own slice, put them back at the env index
+        infos = {}
+        for (start, end), worker_infos in zip(self.slices, results):
+            for key, value in worker_infos.items():
+                if key not in infos:
+                    infos[key] = np.full(self.num_envs, None, dtype=object) if value.dtype == object else np.zeros(self.num_envs, dtype=value.dtype)
+                infos[key][start:end] = value
+        return infos
+
+    def reset_wait(self, seed=None, options=None):
+        self.send("reset", {"seed": seed, "options": options})
+        return self.observations, self.merge_infos(self.receive())
+
+    def step_async(self, actions):
+        np.copyto(self.actions, np.asarray(actions).reshape(self.num_envs, -1)[:, 0])
+        self.send("step")
+
+    def step_wait(self):
+        infos = self.merge_infos(self.receive())
+        return self.observations, self.rewards, self.terminations, self.truncations, infos
+
+    def set_params(self, **params):
+        # physical parameters (see DeliveryEnv.set_params), one value for all envs or one value per env
+        params = per_env_params(params, self.num_envs)
+        for pipe, (start, end) in zip(self.pipes, self.slices):
+            pipe.send(("call", ("set_params", (), {name: value[start:end] for name, value in params.items()})))
+        self.receive()
+
+    def get_state(self):
+        # snapshot of the envs (see DeliveryVectorEnv.get_state), one per worker
+        return self.call("get_state")
+
+    def canonicalize(self):
+        self.call("canonicalize")
+
+    def set_state(self, state):
+        if len(state) != self.num_workers:
+            raise ValueError(f"State of {len(state)} workers, this env has {self.num_workers}")
+        for pipe, worker_state in zip(self.pipes, state):
+            pipe.send(("call", ("set_state", (worker_state,), {})))
+        self.receive()
+
+    def call(self, name, *args, **kwargs):
+        # calls a method of every worker's vector env and returns the results per worker
+        self.send("call", (name, args, kwargs))
+        return self.receive()
+
+    def close_extras(self, timeout=None, terminate=False):
+        if not terminate:
+            try:
+                self.send("close")
+                self.receive()
+            except (BrokenPipeError, EOFError, RuntimeError):
+                terminate = True
+        for process in self.processes:
+            if terminate and process.is_alive():
+                process.terminate()
+            process.join(timeout)
+        for pipe in self.pipes:
+            pipe.close()
+        self.pipes, self.processes = [], []
@@ -0,0 +1,298 @@
+import time
+
+import numpy as np
+import gymnasium as gym
+
+from env import DeliveryEnv, RECT_X, RECT_VX, SQUARE_X, SQUARE_VX, STATE_SIZE
+
+# Physical parameters of DeliveryEnv.set_params and the shape of one value (sizes are (width, height))
+PARAM_SHAPES = {
+    "obj_mass": (), "obj_friction": (), "obj_size": (2,),
+    "rect_mass": (), "rect_friction": (), "rect_size": (2,),
+    "gravity": (),
+}
+
+
+def per_env_params(params, num_envs):
+    # each parameter is one value for all envs or one value per env -> (num_envs,) + shape arrays
+    arrays = {}
+    for name, value in params.items():
+        if name not in PARAM_SHAPES:
+            raise ValueError(f"Unknown parameter `{name}`, expected one of {list(PARAM_SHAPES)}")
+        arrays[name] = np.broadcast_to(np.asarray(value, dtype=np.float64), (num_envs,) + PARAM_SHAPES[name])
+    return arrays
+
+
+class BatchRunningMeanStd:
+    # Per-env running mean/var of the observations. This is the same update as the
+    # gym.wrappers.NormalizeObservation wrapper (one RunningMeanStd per env) done for all envs at once.
+
+    def __init__(self, num_envs, shape, epsilon=1e-4):
+        self.mean = np.zeros((num_envs,) + shape, dtype=np.float64)
+        self.var = np.ones((num_envs,) + shape, dtype=np.float64)
+        self.count = np.full((num_envs, 1), epsilon, dtype=np.float64)
+
+    def update(self, x, mask=None):
+        # one sample per env; mask selects the envs to update (all when None)
+        if mask is None:
+            mask = slice(None)
+        mean, var, count = self.mean[mask], self.var[mask], self.count[mask]
+
+        delta = x[mask] - mean
+        tot_count = count + 1
+        m2 = var * count + np.square(delta) * count / tot_count
+
+        self.mean[mask] = mean + delta / tot_count
+        self.var[mask] = m2 / tot_count
+        self.count[mask] = tot_count
+
+
+def pool_obs_stats(mean, var, count):
+    # one (mean, var) from the per-env statistics of BatchRunningMeanStd: the statistics of all the
+    # observations seen by the envs together
+    weights = count / count.sum()
+    pooled_mean = (weights * mean).sum(axis=0)
+    pooled_var = (weights * (var + np.square(mean - pooled_mean))).sum(axis=0)
+    return pooled_mean, pooled_var
+
+
+class DeliveryVectorEnv(gym.vector.VectorEnv):
+    # N tray/box pairs stepped in one call in the current process (one Box2D world per pair).
+    # Drop-in for the gym.vector.AsyncVectorEnv pool used in continuous_ppo.py:
+    #   normalize_obs=True  -> same as gym.wrappers.NormalizeObservation on every env
+    #   record_stats=True   -> same as gym.wrappers.RecordEpisodeStatistics on every env
+    #   obs_stats=(mean, var) -> observations normalised with these fixed statistics (not updated),
+    #                            e.g. the ones of a trained agent for its evaluation
+    #   max_episode_steps=n -> an episode is truncated after n steps (same as gym.wrappers.TimeLimit)
+    # Finished envs are reset automatically, the last observation/info is reported in
+    # infos["final_observation"] / infos["final_info"] like the gymnasium vector envs.
+    #
+    # The arrays returned by reset/step are preallocated and overwritten on the next call,
+    # copy them if they have to be kept.
+
+    def __init__(self, num_envs, normalize_obs=False, record_stats=True, epsilon=1e-8, obs_stats=None,
+                 max_episode_steps=None, **env_kwargs):
+
+        if env_kwargs.get("obs_noise") is not None:
+            raise ValueError("obs_noise is only supported by DeliveryEnv, the vector envs build the observations themselves")
+        super().__init__(num_envs, DeliveryEnv.observation_space, DeliveryEnv.action_space)
+        self.envs = self.make_envs(num_envs, **env_kwargs)
+
+        self.normalize_obs = normalize_obs
+        self.record_stats = record_stats
+        self.epsilon = epsilon
+        self.max_episode_steps = max_episode_steps
+
+        # preallocated buffers
+        obs_shape = self.single_observation_space.shape
+        self.state = np.zeros((num_envs, STATE_SIZE), dtype=np.float64)
+        self.raw_obs = np.zeros((num_envs,) + obs_shape, dtype=np.float64)
+        self.observations = np.zeros((num_envs,) + obs_shape, dtype=np.float32)
+        self.rewards = np.zeros(num_envs, dtype=np.float32)
+        self.terminations = np.zeros(num_envs, dtype=np.bool_)
+        self.truncations = np.zeros(num_envs, dtype=np.bool_)
+        self.actions = np.zeros(num_envs, dtype=np.float64)
+
+        # each env caches its body state straight into its row of self.state
+        for env, row in zip(self.envs, self.state):
+            env.body_state = row
+
+        self.obs_rms = BatchRunningMeanStd(num_envs, obs_shape) if normalize_obs and obs_stats is None else None
+        self.obs_stats = None if obs_stats is None else tuple(np.asarray(v, dtype=np.float64) for v in obs_stats)
+
+        # episode statistics
+        self.episode_returns = np.zeros(num_envs, dtype=np.float32)
+        self.episode_lengths = np.zeros(num_envs, dtype=np.int32)
+        self.episode_start_times = np.zeros(num_envs, dtype=np.float64)
+
+    def use_buffers(self, observations, rewards, terminations, truncations, copy=True):
+        # make the env write its outputs straight into the given arrays (e.g. views of a shared-memory block).
+        # copy=False skips copying the current outputs, for buffers that are switched before every
+        # step (e.g. the rows of rollout.RolloutBuffer): a step rewrites all of them
+        for name, buffer in (("observations", observations), ("rewards", rewards),
+                             ("terminations", terminations), ("truncations", truncations)):
+            current = getattr(self, name)
+            if buffer.shape != current.shape or buffer.dtype != current.dtype:
+                raise ValueError(f"{name} buffer must be {current.dtype}{current.shape}, got {buffer.dtype}{buffer.shape}")
+            if copy:
+                buffer[...] = current
+            setattr(self, name, buffer)
+
+    # Snapshot of everything the next steps depend on: the worlds (DeliveryEnv.get_state and the
+    # fast-forward state), the current observations, the normalisation statistics and the running
+    # episodes. get_state only reads the envs. set_state(get_state()) in a new env with the same
+    # settings goes on with the exact same outputs as this env when the worlds were put in the
+    # canonical form of DeliveryEnv.set_state first (canonicalize(), the trainers call it after every
+    # update, see checkpoint.py). Checked over autoresets on both backends by
+    # python benchmarks/exact_vector_env_state.py
+    def get_state(self):
+        now = time.perf_counter()
+        return {
+            "worlds": [env.get_state() for env in self.envs],
+            "fast_forward": [(env.ff_last, env.ff_step, env.ff_count) for env in self.envs],
+            "raw_obs": self.raw_obs.copy(),
+            "observations": self.observations.copy(),
+            "obs_rms": None if self.obs_rms is None else (self.obs_rms.mean.copy(), self.obs_rms.var.copy(), self.obs_rms.count.copy()),
+            "episode_returns": self.episode_returns.copy(),
+            "episode_lengths": self.episode_lengths.copy(),
+            "episode_times": now - self.episode_start_times,
+        }
+
+    def set_state(self, state):
+        if len(state["worlds"]) != self.num_envs:
+            raise ValueError(f"State of {len(state['worlds'])} envs, this env has {self.num_envs}")
+        if (state["obs_rms"] is None) != (self.obs_rms is None):
+            raise ValueError("State and env do not agree on normalize_obs")
+        for env, world, (ff_last, ff_step, ff_count) in zip(self.envs, state["worlds"], state["fast_forward"]):
+            env.set_state(world)
+            env.ff_last, env.ff_step, env.ff_count = ff_last, ff_step, ff_count
+        self.read_state()
+
+        # the outputs are written into the current buffers (they may be bound to a rollout buffer)
+        self.raw_obs[...] = state["raw_obs"]
+        self.observations[...] = state["observations"]
+        if self.obs_rms is not None:
+            self.obs_rms.mean[...], self.obs_rms.var[...], self.obs_rms.count[...] = state["obs_rms"]
+        self.episode_returns[...] = state["episode_returns"]
+        self.episode_lengths[...] = state["episode_lengths"]
+        self.episode_start_times[...] = time.perf_counter() - state["episode_times"]
+
+    def make_envs(self, num_envs, **env_kwargs):
+        # headless envs; drawing and real-time pacing are not supported in the batched env
+        return [DeliveryEnv(realtime=False, **env_kwargs) for _ in range(num_envs)]
+
+    ############################################################################ backend part ############################################################################
+    # The methods below are the only ones that touch the physics, the rest of the class works on self.state.
+
+    def reset_envs(self, mask):
+        for i in np.flatnonzero(mask):
+            self.envs[i].reset()
+
+    def simulate(self, actions):
+        for env, action in zip(self.envs, actions):
+            env.simulate(action)
+
+    def canonicalize(self):
+        # worlds in the canonical form of DeliveryEnv.set_state (see get_state)
+        for env in self.envs:
+            env.canonicalize()
+
+    def read_state(self, mask=None):
+        indices = range(self.num_envs) if mask is None else np.flatnonzero(mask)
+        envs = self.envs
+        for i in indices:
+            # writes into state[i], see __init__
+            envs[i].read_body_state()
+
+    def set_params(self, **params):
+        # physical parameters of DeliveryEnv.set_params, one value for all envs or one value per env
+        params = per_env_params(params, self.num_envs)
+        for i, env in enumerate(self.envs):
+            env.set_params(**{name: value[i] for name, value in params.items()})
+
+    ########################################################################## end backend part ##########################################################################
+
+    # Same contract as DeliveryEnv.get_observation for the selected envs (all when mask is None)
+    def observe(self, mask=None):
+        if mask is None:
+            mask = slice(None)
+        state = self.state[mask]
+        self.raw_obs[mask, :STATE_SIZE] = state
+        self.raw_obs[mask, 4] = state[:, RECT_X] - state[:, SQUARE_X]
+
+    # Same contract as DeliveryEnv.get_reward and DeliveryEnv.terminate_cond for all envs at once
+    def evaluate(self):
+        diff_x = self.raw_obs[:, 4]
+        failed = diff_x > 30
+        delivered = self.raw_obs[:, RECT_X] >= 699
+
+        # -1 on a failed delivery, +1 on a successful one
+        self.rewards[:] = delivered
+        self.rewards -= failed
+        np.logical_or(failed, delivered, out=self.terminations)
+
+    def normalize(self, mask=None):
+        # writes the (normalised) float32 observation of the selected envs
+        if mask is None:
+            mask = slice(None)
+        if self.obs_stats is not None:
+            mean, var = self.obs_stats
+        elif self.obs_rms is not None:
+            self.obs_rms.update(self.raw_obs, mask)
+            mean, var = self.obs_rms.mean[mask], self.obs_rms.var[mask]
+        else:
+            self.observations[mask] = self.raw_obs[mask]
+            return
+        self.observations[mask] = (self.raw_obs[mask] - mean) / np.sqrt(var + self.epsilon)
+
+    def reset_wait(self, seed=None, options=None):
+        self.reset_envs(np.ones(self.num_envs, dtype=np.bool_))
+        self.read_state()
+        self.observe()
+        self.normalize()
+
+        self.episode_returns[:] = 0
+        self.episode_lengths[:] = 0
+        self.episode_start_times[:] = time.perf_counter()
+
+        return self.observations, {}
+
+    def step_async(self, actions):
+        self.actions[:] = np.asarray(actions, dtype=np.float64).reshape(self.num_envs, -1)[:, 0]
+
+    def step_wait(self):
+        self.simulate(self.actions)
+        self.read_state()
+        self.observe()
+        self.evaluate()
+        self.normalize()
+
+        self.episode_returns += self.rewards
+        self.episode_lengths += 1
+        if self.max_episode_steps is not None:
+            np.greater_equal(self.episode_lengths, self.max_episode_steps, out=self.truncations)
+
+        infos = {}
+        dones = self.terminations | self.truncations
+        if dones.any():
+            infos = self.final_infos(dones)
+
+            # autoreset of the finished envs; rewards and terminations keep the values of the last step
+            self.reset_envs(dones)
+            self.read_state(dones)
+            self.observe(dones)
+            self.normalize(dones)
+
+            self.episode_returns[dones] = 0
+            self.episode_lengths[dones] = 0
+            self.episode_start_times[dones] = time.perf_counter()
+
+        return self.observations, self.rewards, self.terminations, self.truncations, infos
+
+    def final_infos(self, dones):
+        # same layout as the gymnasium vector envs: object arrays with a "_key" mask
+        final_observation = np.full(self.num_envs, None, dtype=object)
+        final_info = np.full(self.num_envs, None, dtype=object)
+
+        now = time.perf_counter()
+        for i in np.flatnonzero(dones):
+            final_observation[i] = self.observations[i].copy()
+            info = {}
+            if self.record_stats:
+                info["episode"] = {
+                    "r": np.array([self.episode_returns[i]], dtype=np.float32),
+                    "l": np.array([self.episode_lengths[i]], dtype=np.int32),
+                    "t": np.array([round(now - self.episode_start_times[i], 6)], dtype=np.float32),
+                }
+            final_info[i] = info
+
+        return {
+            "final_observation": final_observation,
+            "_final_observation": dones.copy(),
+            "final_info": final_info,
+            "_final_info": dones.copy(),
+        }
+
+    def close_extras(self, **kwargs):
+        for env in self.envs:
+            env.close()
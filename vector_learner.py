@@ -0,0 +1,297 @@
+# Population of independent ICO/ISO learners advanced in lockstep with NumPy.
+#
+# usage: python vector_learner.py [rule] [l_rates] [obj_mass] [obj_friction] [backend]
+#   e.g. python vector_learner.py mICO 0.001,0.003,0.01,0.03 3.0 1.0 box2d
+#
+# VectorLearner is learner.Learner for N learners at once: every learner has its own rule
+# settings, constants (co, cp, wr, l_rate, et, pt, rt, max_speed) given as one value or one value
+# per learner, and its own state. A tick is the same as Learner.tick for every learner, finished
+# (done or failed) learners are left as they are.
+#
+# The learners run in a batch of tray worlds (same world as learner_sim.make_world, each with its
+# own object mass/friction):
+#   Box2DTrays   : one Box2D world per learner, the same physics as the templates. A learner gives
+#                  exactly the same weight/attempts/ticks as Learner in learner_sim.run (default)
+#   ReducedTrays : the NumPy tray/object model of reduced_env.py at the 1/60 s step, ~20x faster for
+#                  large sweeps but approximate: slow and long runs can end differently than in Box2D,
+#                  so use it to screen a grid and check the interesting points with box2d
+# run_population() runs a population until every learner is finished, e.g. a learning rate sweep.
+
+import sys
+import time
+
+import numpy as np
+
+from convergence import FAILED, STATIONARY, OSCILLATING, ATTEMPT_BUDGET, DELIVERED, DROPPED, STOPPED
+from learner import RULES
+from learner_kernel import round2
+from learner_sim import make_world, TIME_STEP
+from noise import UniformNoise
+from reduced_env import ReducedDeliveryVectorEnv
+from vector_env import RECT_X, RECT_VX, SQUARE_X
+
+
+class VectorLearner:
+
+    def __init__(self, num, rule="mICO", co=1, cp=None, wr=1, l_rate=0.01, et=10, pt=30, rt=70, max_speed=1500,
+                 noise=0, noise_seed=0, wa=0.0, monitor=False, window=10, tol=1e-6, attempt_ticks=10000, max_attempts=None):
+        self.num = num
+        rules = np.broadcast_to(np.asarray(rule), (num,))
+        self.rule = rules.copy()
+        self.so_term = np.array([RULES[r]["so_term"] for r in rules])
+        self.iso = np.array([RULES[r]["driver"] == "o_neural" for r in rules])
+        default_cp = np.array([RULES[r]["cp"] for r in rules], dtype=np.float64)
+
+        def per_learner(value):
+            return np.broadcast_to(np.asarray(value, dtype=np.float64), (num,)).copy()
+
+        # Constants, one value per learner
+        self.co = per_learner(co)
+        self.cp = default_cp if cp is None else per_learner(cp)
+        self.wr = per_learner(wr)
+        self.l_rate = per_learner(l_rate)
+        self.et, self.pt, self.rt = per_learner(et), per_learner(pt), per_learner(rt)
+        self.max_speed = per_learner(max_speed)
+
+        # Position noise of the objects, uniform integer in [0, noise) px. Every learner has its own
+        # noise.UniformNoise(0, noise, seed) (noise_seed: one seed or one per learner, None for a random
+        # one) and takes a value from it only on its own ticks, so it sees the same noise as
+        # headless_runner.run(..., seed=noise_seed). The blocks of the streams are kept side by side.
+        self.noise = noise
+        if noise:
+            seeds = np.broadcast_to(np.asarray(noise_seed, dtype=object), (num,))
+            self.noise_streams = [UniformNoise(0, noise, seed=seed) for seed in seeds]
+            block_size = self.noise_streams[0].block_size
+            self.noise_values = np.zeros((num, block_size), dtype=np.int64)
+            self.noise_index = np.full(num, block_size)                        # next value of every stream
+
+        # Learner state
+        self.wa = per_learner(wa)
+        self.t_prev = np.zeros(num)
+        self.prev = np.zeros(num)
+        self.attempt = np.ones(num, dtype=np.int64)
+        self.redo = np.zeros(num, dtype=np.int64)
+        self.failed = np.zeros(num, dtype=np.bool_)
+        self.ticks = np.zeros(num, dtype=np.int64)                              # ticks until done/failed
+
+        # Convergence monitoring (monitor=True), the same checks and settings as convergence.ConvergenceMonitor
+        self.monitor = monitor
+        self.window, self.tol = window, tol
+        self.attempt_ticks, self.max_attempts = attempt_ticks, max_attempts
+        self.reason = np.full(num, "", dtype="<U14")                           # reason code of a stopped learner
+        self.attempt_ticks_used = np.zeros(num, dtype=np.int64)
+        self.wa_end = self.wa.copy()
+        self.last_end = np.full(num, -1, dtype=np.int64)
+        self.still = np.zeros(num, dtype=np.int64)
+        self.alternating = np.zeros(num, dtype=np.int64)
+
+    def done(self):
+        return self.failed | (self.redo >= 2) | (self.reason != "")
+
+    def signal_generator(self, xc, xr):
+        diff_x = np.abs(xc-xr)
+        et, pt, rt = self.et, self.pt, self.rt
+
+        exempt = diff_x < et
+        predictive = (diff_x >= et) & (diff_x < pt)
+        reflexive = (diff_x >= pt) & (diff_x < rt)
+        out = ~(exempt | predictive | reflexive)
+
+        so = np.where(out, 0.0, 1.0)
+        sp = np.where(exempt, 0.0, np.where(predictive, round2((diff_x-et)/(pt-et)+0.005), 1.0))
+        sr = np.where(reflexive, round2((diff_x-pt)/(rt-pt)+0.005), np.where(out, 1.0, 0.0))
+        return so, sp, sr
+
+    def position_noise(self, active):
+        # next noise value of every active learner (0 for the others), one per tick as Learner.tick
+        block_size = self.noise_values.shape[1]
+        for i in np.flatnonzero(active & (self.noise_index == block_size)):
+            self.noise_values[i] = self.noise_streams[i].generate(block_size)
+            self.noise_index[i] = 0
+        values = self.noise_values[np.arange(self.num), np.minimum(self.noise_index, block_size - 1)]
+        self.noise_index += active
+        return np.where(active, values, 0)
+
+    # One tick of all learners (see Learner.tick). Returns (speed, set_speed, reset) arrays:
+    # the tray speed of the learners with set_speed, and the learners whose world has to be reset.
+    def tick(self, xc, xr, t):
+        active = ~self.done()
+        if self.noise:
+            xc = xc + self.position_noise(active)
+        so, sp, sr = self.signal_generator(xc, xr)
+
+        # weight over 1: failed
+        failing = active & (self.wa > 1)
+        self.failed |= failing
+        active &= ~failing
+        self.ticks += active
+
+        # object out of the learning area
+        out = active & ((so == 0) | (sr == 1))
+        self.prev[out] = 0.0
+        self.attempt += out
+        learn = active & ~out
+
+        # neural output
+        wa = self.wa
+        so_term = self.co*so*wa
+        sp_term = self.cp*sp*wa
+        sr_term = sr*self.wr
+        o_neural = np.where(self.so_term, so_term+sp_term+sr_term, sp_term+sr_term)
+
+        # weight update, driven by sr (ICO) or o_neural (ISO)
+        signal = np.where(self.iso, o_neural, sr)
+        factor = np.where(self.iso, o_neural, sp)
+        t_delta = t-self.t_prev
+        rising = (t_delta != 0) & (signal >= self.prev)
+        delta = np.divide(signal-self.prev, t_delta, out=np.zeros(self.num), where=rising)
+        new_wa = self.l_rate * factor * delta + wa
+
+        self.wa = np.where(learn, new_wa, wa)
+        self.prev = np.where(learn, signal, self.prev)
+        self.t_prev = np.where(learn, t, self.t_prev)
+
+        # output speed
+        speed = self.max_speed - (self.max_speed * o_neural)
+        stop = learn & (speed < 1)
+        speed[stop] = 0
+        self.attempt += stop
+
+        # delivered: one more attempt to confirm the weight
+        delivered = learn & (xr >= 699)
+        self.prev[delivered] = 0.0
+        self.redo += delivered
+        self.attempt += delivered
+
+        if self.monitor:
+            self.check_convergence(active, out, stop, delivered)
+
+        return speed, learn, out | stop | delivered
+
+    def check_convergence(self, active, out, stop, delivered):
+        # ConvergenceMonitor.update for the learners active in this tick
+        finite = np.isfinite(self.wa)
+        checked = active & finite
+        self.attempt_ticks_used += checked
+        end = checked & (out | stop | delivered)
+        over_budget = checked & ~end & (self.attempt_ticks_used > self.attempt_ticks)
+        self.attempt_ticks_used[end] = 0
+
+        kind = np.where(delivered, DELIVERED, np.where(out, DROPPED, STOPPED))
+        missed = end & ~delivered
+        still = np.abs(self.wa - self.wa_end) <= self.tol
+        alternate = (self.last_end >= 0) & (self.last_end != DELIVERED) & (kind != self.last_end)
+        self.still = np.where(end, np.where(missed & still, self.still + 1, 0), self.still)
+        self.alternating = np.where(end, np.where(missed & alternate, self.alternating + 1, 0), self.alternating)
+        self.wa_end = np.where(end, self.wa, self.wa_end)
+        self.last_end = np.where(end, kind, self.last_end)
+
+        going_on = end & ~(self.failed | (self.redo >= 2))
+        stationary = going_on & (self.still >= self.window)
+        oscillating = going_on & ~stationary & (self.alternating >= self.window)
+        too_many = going_on & ~stationary & ~oscillating
+        if self.max_attempts is not None:
+            too_many &= self.attempt > self.max_attempts
+        else:
+            too_many[:] = False
+
+        self.reason[active & ~finite] = FAILED
+        self.reason[over_budget | too_many] = ATTEMPT_BUDGET
+        self.reason[stationary] = STATIONARY
+        self.reason[oscillating] = OSCILLATING
+
+        # the tick that stops a learner is not counted, as in learner_sim.run
+        self.ticks -= active & (self.reason != "")
+
+
+class Box2DTrays:
+    # one template world per learner
+
+    def __init__(self, num, obj_mass=0.03, obj_friction=1.0, **world_kwargs):
+        obj_mass = np.broadcast_to(obj_mass, (num,))
+        obj_friction = np.broadcast_to(obj_friction, (num,))
+        self.worlds = [make_world(float(m), float(f), **world_kwargs) for m, f in zip(obj_mass, obj_friction)]
+        self.xc = np.zeros(num)
+        self.xr = np.zeros(num)
+
+    def positions(self):
+        for i, sim in enumerate(self.worlds):
+            self.xc[i] = sim["square_body"].position.x
+            self.xr[i] = sim["rect_body"].position.x
+        return self.xc, self.xr
+
+    def set_speed(self, speed, mask):
+        for i in np.flatnonzero(mask):
+            self.worlds[i]["rect_body"].linearVelocity = (speed[i], 0)
+
+    def reset(self, mask):
+        for i in np.flatnonzero(mask):
+            sim = self.worlds[i]
+            sim["rect_body"].linearVelocity = (0, 0)
+            sim["rect_body"].position = sim["rect_position"]
+            sim["square_body"].linearVelocity = (0, 0)
+            sim["square_body"].position = sim["square_position"]
+
+    def step(self, mask):
+        for i in np.flatnonzero(mask):
+            self.worlds[i]["world"].Step(TIME_STEP, 1, 1)
+
+
+class ReducedTrays:
+    # NumPy tray/object model (reduced_env.py) at the template time step
+
+    def __init__(self, num, obj_mass=0.03, obj_friction=1.0, **world_kwargs):
+        self.env = ReducedDeliveryVectorEnv(num, record_stats=False, obj_mass=obj_mass, obj_friction=obj_friction,
+                                            substeps=1, target_fps=1/TIME_STEP, **world_kwargs)
+        self.env.reset_envs(np.ones(num, dtype=np.bool_))
+
+    def positions(self):
+        state = self.env.state
+        return state[:, SQUARE_X], state[:, RECT_X]
+
+    def set_speed(self, speed, mask):
+        self.env.state[mask, RECT_VX] = speed[mask]
+
+    def reset(self, mask):
+        self.env.reset_envs(mask)
+
+    def step(self, mask):
+        # all worlds are stepped, the finished ones are not used anymore
+        self.env.integrate()
+
+
+def run_population(learner, trays, max_ticks=100000):
+    # runs every learner until it is done or failed (or max_ticks), returns the number of ticks
+    ticks = 0
+    while ticks < max_ticks:
+        active = ~learner.done()
+        if not active.any():
+            break
+        xc, xr = trays.positions()
+        speed, set_speed, reset = learner.tick(xc, xr, ticks * TIME_STEP)
+        trays.set_speed(speed, set_speed)
+        trays.reset(reset)
+        trays.step(active & ~learner.failed)
+        ticks += 1
+    return ticks
+
+
+if __name__ == "__main__":
+
+    rule = sys.argv[1] if len(sys.argv) > 1 else "mICO"
+    l_rates = [float(v) for v in sys.argv[2].split(",")] if len(sys.argv) > 2 else [0.001, 0.003, 0.01, 0.03, 0.1]
+    obj_mass = float(sys.argv[3]) if len(sys.argv) > 3 else 0.03
+    obj_friction = float(sys.argv[4]) if len(sys.argv) > 4 else 1.0
+    backend = sys.argv[5] if len(sys.argv) > 5 else "box2d"
+
+    learner = VectorLearner(len(l_rates), rule, l_rate=l_rates)
+    trays = (Box2DTrays if backend == "box2d" else ReducedTrays)(len(l_rates), obj_mass, obj_friction)
+    start = time.perf_counter()
+    ticks = run_population(learner, trays)
+    elapsed = time.perf_counter() - start
+
+    print(f"{rule}, {obj_mass} kg, friction {obj_friction}, {backend} physics: {len(l_rates)} learners, {ticks} ticks in {elapsed:.2f} s")
+    print(f"{'l_rate':>8} {'outcome':>14} {'attempts':>9} {'weight':>9} {'time (s)':>9}")
+    for i, l_rate in enumerate(l_rates):
+        outcome = "failed" if learner.failed[i] else "done" if learner.redo[i] >= 2 else learner.reason[i] or "running"
+        print(f"{l_rate:8.4f} {outcome:>14} {learner.attempt[i]:9d} {learner.wa[i]:9.6f} {learner.ticks[i] * TIME_STEP:9.1f}")